@@ -20,3 +20,4 @@ limitations under the License.
 """
 from .interval import Interval
 from .intervaltree import IntervalTree
+from .frozenintervaltree import FrozenIntervalTree
@@ -0,0 +1,143 @@
+"""
+intervaltree: A mutable, self-balancing interval tree for Python 2 and 3.
+Queries may be by point, by range overlap, or by range envelopment.
+
+Vectorized queries over NumPy arrays. NumPy is an optional dependency,
+needed only by the IntervalTree methods that use this module.
+
+Copyright 2013-2015 Chaim-Leib Halbert
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+np = None  # imported by require_numpy(), so importing intervaltree stays cheap
+
+
+def require_numpy():
+    """
+    Imports NumPy on first use. Must be called before the other
+    functions of this module.
+    :raises ImportError: if NumPy is not installed
+    """
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy is required for array queries")
+        np = numpy
+    return np
+
+
+def interval_arrays(intervals):
+    """
+    Returns (begins, ends) arrays for an iterable of Intervals sorted
+    by begin.
+    """
+    intervals = list(intervals)
+    begins = np.array([iv.begin for iv in intervals])
+    ends = np.array([iv.end for iv in intervals])
+    return begins, ends
+
+
+def expand_runs(starts, counts):
+    """
+    Concatenates the integer runs [start, start + count) for each
+    start and count.
+    """
+    total = int(counts.sum())
+    run_offsets = np.cumsum(counts) - counts
+    return np.arange(total) + np.repeat(starts - run_offsets, counts)
+
+
+def point_pairs(begins, ends, points):
+    """
+    Returns (point_ids, interval_ids) arrays listing every pair where
+    interval begins[i], ends[i] contains points[j].
+
+    Sorts the points, so that the points contained by each interval
+    form a contiguous run that searchsorted() can find.
+    """
+    order = np.argsort(points, kind='mergesort')
+    sorted_points = points[order]
+    first = np.searchsorted(sorted_points, begins, 'left')
+    last = np.searchsorted(sorted_points, ends, 'left')
+    counts = last - first
+    interval_ids = np.repeat(np.arange(len(begins)), counts)
+    point_ids = order[expand_runs(first, counts)]
+    return point_ids, interval_ids
+
+
+def range_pairs(begins, ends, range_begins, range_ends, strict=False):
+    """
+    Returns (range_ids, interval_ids) arrays listing every pair where
+    interval begins[i], ends[i] overlaps (or, if strict, is enveloped
+    by) range_begins[j], range_ends[j].
+
+    An interval overlaps a range iff it begins inside the range, or it
+    begins before the range and contains range_begins[j]. Intervals
+    beginning inside a range form a contiguous run of begins.
+    """
+    first = np.searchsorted(begins, range_begins, 'left')
+    last = np.searchsorted(begins, range_ends, 'left')
+    counts = np.maximum(last - first, 0)
+    range_ids = np.repeat(np.arange(len(range_begins)), counts)
+    interval_ids = expand_runs(first, counts)
+    if strict:
+        keep = ends[interval_ids] <= range_ends[range_ids]
+        return range_ids[keep], interval_ids[keep]
+
+    point_ids, straddling_ids = point_pairs(begins, ends, range_begins)
+    keep = (
+        (begins[straddling_ids] < range_begins[point_ids]) &
+        (range_begins[point_ids] < range_ends[point_ids])
+    )
+    return (
+        np.concatenate([range_ids, point_ids[keep]]),
+        np.concatenate([interval_ids, straddling_ids[keep]])
+    )
+
+
+def to_csr(query_ids, interval_ids, size):
+    """
+    Groups (query_id, interval_id) pairs by query into
+    (offsets, indices) arrays, so that the matches for query j are
+    indices[offsets[j]:offsets[j + 1]], in ascending order.
+    """
+    order = np.lexsort((interval_ids, query_ids))
+    offsets = np.zeros(size + 1, dtype=np.intp)
+    np.cumsum(np.bincount(query_ids, minlength=size), out=offsets[1:])
+    return offsets, interval_ids[order].astype(np.intp)
+
+
+def search_points(begins, ends, points):
+    """
+    Returns (offsets, indices) arrays of the intervals containing each
+    of the points. See IntervalTree.search_points_array().
+    """
+    points = np.asarray(points)
+    point_ids, interval_ids = point_pairs(begins, ends, points)
+    return to_csr(point_ids, interval_ids, len(points))
+
+
+def search_ranges(begins, ends, range_begins, range_ends, strict=False):
+    """
+    Returns (offsets, indices) arrays of the intervals overlapping (or,
+    if strict, enveloped by) each of the ranges. See
+    IntervalTree.search_ranges_array().
+    """
+    range_begins = np.asarray(range_begins)
+    range_ends = np.asarray(range_ends)
+    range_ids, interval_ids = range_pairs(
+        begins, ends, range_begins, range_ends, strict
+    )
+    return to_csr(range_ids, interval_ids, len(range_begins))
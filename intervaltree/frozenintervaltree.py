@@ -0,0 +1,513 @@
+"""
+intervaltree: A mutable, self-balancing interval tree for Python 2 and 3.
+Queries may be by point, by range overlap, or by range envelopment.
+
+Immutable, array-backed interval tree.
+
+Copyright 2013-2015 Chaim-Leib Halbert
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from .interval import Interval
+from .intervaltree import IntervalTree, sort_key
+from array import array
+from bisect import bisect_left, bisect_right
+import collections
+
+try:
+    xrange  # Python 2?
+except NameError:  # pragma: no cover
+    xrange = range
+
+try:
+    array('q')
+    INT_TYPECODE = 'q'
+except ValueError:  # pragma: no cover
+    INT_TYPECODE = 'l'  # Python 2 and < 3.3
+
+
+def make_column(values):
+    """
+    Packs values into an array when they are all ints or all floats,
+    which takes 8 bytes per value instead of a pointer plus an object.
+    Otherwise returns them as a list.
+    :rtype: array or list
+    """
+    values = list(values)
+    kinds = set(type(value) for value in values)
+    if kinds == set([int]) or kinds == set([float]):
+        try:
+            return array('d' if float in kinds else INT_TYPECODE, values)
+        except OverflowError:
+            pass
+    return values
+
+
+def build_max_ends(ends):
+    """
+    Lays an implicit binary tree over the positions of a list of
+    intervals sorted by begin, and computes the greatest end in each
+    subtree.
+
+    Nodes at level k are the positions whose lowest k bits are 1, so
+    leaves are the even positions and the root is 2**max_level - 1.
+    The node at position i on level k has children i - 2**(k-1) and
+    i + 2**(k-1), which may lie past the end of the list.
+
+    See Heng Li's cgranges library for reference.
+    :return: (max_ends, max_level)
+    :rtype: tuple
+    """
+    n = len(ends)
+    if not n:
+        return [], -1
+    max_ends = list(ends)
+    last_i = last = None  # rightmost node at the current level, and its max end
+    for i in xrange(0, n, 2):
+        last_i, last = i, max_ends[i]
+    k = 1
+    while 1 << k <= n:
+        x = 1 << (k - 1)
+        for i in xrange((x << 1) - 1, n, x << 2):
+            left = max_ends[i - x]
+            right = max_ends[i + x] if i + x < n else last
+            max_ends[i] = max(ends[i], left, right)
+        last_i = last_i - x if last_i >> k & 1 else last_i + x
+        if last_i < n and max_ends[last_i] > last:
+            last = max_ends[last_i]
+        k += 1
+    return max_ends, k - 1
+
+
+class FrozenIntervalTree(collections.Set):
+    """
+    An immutable collection of intervals, supporting the same queries
+    as IntervalTree.
+
+    Intervals are kept in columns of begins and ends sorted by begin,
+    with an implicit balanced tree laid over the positions, so there
+    are no node objects. This takes much less memory than an
+    IntervalTree, and point queries are faster. search_ids() returns
+    positions in the columns instead of Interval objects.
+
+    A tree made with from_columns() is in columnar mode: it keeps no
+    Interval objects at all, only a data column, and creates Intervals
+    for query results as needed. Begins and ends are packed into
+    arrays when they are all ints or all floats, and the data column
+    is dropped when all data is None.
+
+    Examples:
+    ---------
+
+    Initialize from Intervals, or from an IntervalTree::
+
+        >>> tree = FrozenIntervalTree([Interval(-1.1, 1.1), Interval(-0.5, 1.5), Interval(0.5, 1.7)])
+        >>> tree
+        FrozenIntervalTree([Interval(-1.1, 1.1), Interval(-0.5, 1.5), Interval(0.5, 1.7)])
+        >>> FrozenIntervalTree(IntervalTree(tree)) == tree
+        True
+
+    Or from columns, which need not be sorted::
+
+        >>> t = FrozenIntervalTree.from_columns([5, 1, 3], [9, 4, 4], ['c', 'a', 'b'])
+        >>> t
+        FrozenIntervalTree([Interval(1, 4, 'a'), Interval(3, 4, 'b'), Interval(5, 9, 'c')])
+        >>> t.search_ids(3)
+        [0, 1]
+        >>> t.interval_at(1)
+        Interval(3, 4, 'b')
+
+    Queries::
+
+        >>> assert tree[-1.1]            == set([Interval(-1.1, 1.1)])
+        >>> assert tree.search(1.1)      == set([Interval(-0.5, 1.5), Interval(0.5, 1.7)])
+        >>> assert tree[-0.5:0.5]        == set([Interval(-0.5, 1.5), Interval(-1.1, 1.1)])
+        >>> assert tree.search(-0.4, 1.7, strict=True) == set([Interval(0.5, 1.7)])
+        >>> tree.overlaps(1.7)
+        False
+        >>> tree.overlaps(-1.2, -1.0)
+        True
+    """
+    @classmethod
+    def from_tuples(cls, tups):
+        """
+        Create a new FrozenIntervalTree from an iterable of 2- or
+        3-tuples, where the tuple lists begin, end, and optionally data.
+        """
+        return cls(Interval(*t) for t in tups)
+
+    @classmethod
+    def from_columns(cls, begins, ends, data=None):
+        """
+        Create a new FrozenIntervalTree from iterables of begins, ends
+        and optionally data, without creating Interval objects.
+
+        Completes in O(n*log n) time.
+        """
+        begins = list(begins)
+        ends = list(ends)
+        data = [None] * len(begins) if data is None else list(data)
+        if not len(begins) == len(ends) == len(data):
+            raise ValueError(
+                "FrozenIntervalTree: columns have different lengths: "
+                "{0}, {1}, {2}".format(len(begins), len(ends), len(data))
+            )
+        for i in xrange(len(begins)):
+            if begins[i] >= ends[i]:
+                raise ValueError(
+                    "FrozenIntervalTree: Null Interval objects not allowed in"
+                    " FrozenIntervalTree: {0}".format(Interval(begins[i], ends[i], data[i]))
+                )
+
+        # drop duplicates, which sort next to each other, keeping the
+        # data seen in each run of equal begin and end
+        order = []
+        seen = set()
+        unhashable = []  # compared pairwise
+        for i in sorted(xrange(len(begins)), key=lambda i: (begins[i], ends[i])):
+            if order and (begins[order[-1]], ends[order[-1]]) != (begins[i], ends[i]):
+                seen = set()
+                unhashable = []
+            d = data[i]
+            try:
+                if d in seen or any(d == other for other in unhashable):
+                    continue
+                seen.add(d)
+            except TypeError:
+                if any(d == other for other in unhashable) or any(d == other for other in seen):
+                    continue
+                unhashable.append(d)
+            order.append(i)
+
+        tree = cls()
+        tree.intervals = None
+        tree._set_columns([begins[i] for i in order], [ends[i] for i in order])
+        data = [data[i] for i in order]
+        tree.data = None if all(d is None for d in data) else data
+        return tree
+
+    def __init__(self, intervals=None):
+        """
+        Set up a tree holding the given intervals.
+
+        Completes in O(n*log n) time, or O(n) time if intervals is an
+        IntervalTree.
+        """
+        if isinstance(intervals, IntervalTree):
+            ivs = list(intervals.iter_sorted())
+        else:
+            ivs = set(intervals) if intervals is not None else set()
+            for iv in ivs:
+                if iv.is_null():
+                    raise ValueError(
+                        "FrozenIntervalTree: Null Interval objects not allowed in"
+                        " FrozenIntervalTree: {0}".format(iv)
+                    )
+            ivs = sorted(ivs, key=sort_key)
+        self.intervals = ivs
+        self.data = None  # held by the intervals
+        self._set_columns([iv.begin for iv in ivs], [iv.end for iv in ivs])
+
+    def _set_columns(self, begins, ends):
+        """
+        Stores the columns of intervals sorted by begin, then end, and
+        indexes them.
+        """
+        self.begins = make_column(begins)
+        self.ends = make_column(ends)
+        max_ends, self.max_level = build_max_ends(self.ends)
+        if isinstance(self.ends, array):
+            max_ends = array(self.ends.typecode, max_ends)
+        self.max_ends = max_ends
+
+    def interval_at(self, index):
+        """
+        Returns the Interval at the given position in sorted order, as
+        found by search_ids().
+
+        Completes in O(1) time.
+        :rtype: Interval
+        """
+        if self.intervals is not None:
+            return self.intervals[index]
+        return Interval(
+            self.begins[index],
+            self.ends[index],
+            None if self.data is None else self.data[index]
+        )
+
+    def _intervals(self, ids):
+        """
+        Creates the Intervals at the given positions.
+        :rtype: collections.Iterable[Interval]
+        """
+        if self.intervals is not None:
+            intervals = self.intervals
+            return (intervals[i] for i in ids)
+        begins, ends, data = self.begins, self.ends, self.data
+        make = tuple.__new__  # skips Interval.__new__, which only fills in data
+        if data is None:
+            return (make(Interval, (begins[i], ends[i], None)) for i in ids)
+        return (make(Interval, (begins[i], ends[i], data[i])) for i in ids)
+
+    def _iter_overlap_ids(self, low, stop):
+        """
+        Yields, in ascending order, the positions i < stop where
+        ends[i] > low. Since the intervals are sorted by begin, stop
+        is found by bisecting begins, which turns this into an overlap
+        query.
+        """
+        n = len(self.ends)
+        ends = self.ends
+        max_ends = self.max_ends
+        if self.max_level < 0:
+            return
+        # (level, position, whether the left subtree was searched)
+        stack = [(self.max_level, (1 << self.max_level) - 1, False)]
+        while stack:
+            k, x, left_done = stack.pop()
+            if k <= 3:
+                # small subtree; scan it
+                first = x >> k << k
+                for i in xrange(first, min(first + (1 << (k + 1)) - 1, n, stop)):
+                    if low < ends[i]:
+                        yield i
+            elif not left_done:
+                stack.append((k, x, True))
+                y = x - (1 << (k - 1))
+                # y may lie past the end, but still have children before it
+                if y >= n or max_ends[y] > low:
+                    stack.append((k - 1, y, False))
+            elif x < stop:
+                if low < ends[x]:
+                    yield x
+                stack.append((k - 1, x + (1 << (k - 1)), False))
+
+    def search_ids(self, begin, end=None, strict=False):
+        """
+        Returns the positions in sorted order of all intervals
+        overlapping the given point or range, or, if strict is True,
+        fully contained in the range [begin, end]. This is search()
+        without creating Interval objects; see interval_at().
+
+        Completes in O(log n + m) time, where:
+          * n = size of the tree
+          * m = number of matches
+        :rtype: list of int
+        """
+        if end is None:
+            try:
+                begin, end = begin.begin, begin.end
+            except AttributeError:
+                # begin <= point < iv.end
+                return list(self._iter_overlap_ids(
+                    begin, bisect_right(self.begins, begin)
+                ))
+        if begin >= end:
+            return []
+        first = bisect_left(self.begins, begin)
+        stop = bisect_left(self.begins, end)
+        if strict:
+            ends = self.ends
+            return [i for i in xrange(first, stop) if ends[i] <= end]
+        # those straddling begin, then all beginning inside the range
+        result = list(self._iter_overlap_ids(begin, first))
+        result.extend(xrange(first, stop))
+        return result
+
+    def search(self, begin, end=None, strict=False):
+        """
+        Returns a set of all intervals overlapping the given point or
+        range. Or, if strict is True, returns the set of all intervals
+        fully contained in the range [begin, end].
+
+        Completes in O(log n + m) time, where:
+          * n = size of the tree
+          * m = number of matches
+        :rtype: set of Interval
+        """
+        return set(self._intervals(self.search_ids(begin, end, strict)))
+
+    def overlaps(self, begin, end=None):
+        """
+        Returns whether some interval in the tree overlaps the given
+        point or range.
+
+        Completes in O(log n) time.
+        :rtype: bool
+        """
+        if end is None:
+            try:
+                begin, end = begin.begin, begin.end
+            except AttributeError:
+                for i in self._iter_overlap_ids(begin, bisect_right(self.begins, begin)):
+                    return True
+                return False
+        if begin >= end:
+            return False
+        first = bisect_left(self.begins, begin)
+        if first < bisect_left(self.begins, end):
+            return True
+        for i in self._iter_overlap_ids(begin, first):
+            return True
+        return False
+
+    def begin(self):
+        """
+        Returns the lower bound of the first interval in the tree.
+
+        Completes in O(1) time.
+        """
+        if not self.begins:
+            return 0
+        return self.begins[0]
+
+    def end(self):
+        """
+        Returns the upper bound of the last interval in the tree.
+
+        Completes in O(1) time.
+        """
+        if not self.max_ends:
+            return 0
+        # the root's subtree covers every position
+        return self.max_ends[(1 << self.max_level) - 1]
+
+    def range(self):
+        """
+        Returns a minimum-spanning Interval that encloses all the
+        members of this tree. If the tree is empty, returns null
+        Interval.
+        :rtype: Interval
+        """
+        return Interval(self.begin(), self.end())
+
+    def items(self):
+        """
+        Constructs and returns a set of all intervals in the tree.
+
+        Completes in O(n) time.
+        :rtype: set of Interval
+        """
+        return set(self)
+
+    def is_empty(self):
+        """
+        Returns whether the tree is empty.
+
+        Completes in O(1) time.
+        :rtype: bool
+        """
+        return 0 == len(self)
+
+    def __getitem__(self, index):
+        """
+        Returns a set of all intervals overlapping the given index or
+        slice.
+
+        Completes in O(log n + m) time, where:
+          * n = size of the tree
+          * m = number of matches
+        :rtype: set of Interval
+        """
+        try:
+            start, stop = index.start, index.stop
+            if start is None:
+                start = self.begin()
+                if stop is None:
+                    return set(self)
+            if stop is None:
+                stop = self.end()
+            return self.search(start, stop)
+        except AttributeError:
+            return self.search(index)
+
+    def __contains__(self, item):
+        """
+        Returns whether item exists as an Interval in the tree.
+        This method only returns True for exact matches; for
+        overlaps, see the overlaps() method.
+
+        Completes in O(log n) time.
+        :rtype: bool
+        """
+        try:
+            begin = item.begin
+        except AttributeError:
+            return False
+        ids = xrange(bisect_left(self.begins, begin), bisect_right(self.begins, begin))
+        return any(iv == item for iv in self._intervals(ids))
+
+    def __iter__(self):
+        """
+        Returns an iterator over all the intervals in the tree, sorted
+        by begin, then by end.
+
+        Completes in O(1) time.
+        :rtype: collections.Iterable[Interval]
+        """
+        return self._intervals(xrange(len(self)))
+
+    def __len__(self):
+        """
+        Returns how many intervals are in the tree.
+
+        Completes in O(1) time.
+        :rtype: int
+        """
+        return len(self.begins)
+
+    def __eq__(self, other):
+        """
+        Whether two FrozenIntervalTrees hold the same intervals.
+
+        Completes in O(n) time if sizes are equal; O(1) time otherwise.
+        :rtype: bool
+        """
+        return (
+            isinstance(other, FrozenIntervalTree) and
+            len(self) == len(other) and
+            set(self) == set(other)
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        """
+        Depends on the intervals in the tree.
+        :rtype: Number
+        """
+        return self._hash()
+
+    def __repr__(self):
+        """
+        :rtype: str
+        """
+        if not self:
+            return "FrozenIntervalTree()"
+        else:
+            return "FrozenIntervalTree({0})".format(sorted(self))
+
+    __str__ = __repr__
+
+    def __reduce__(self):
+        """
+        For pickle-ing.
+        :rtype: tuple
+        """
+        if self.intervals is not None:
+            return FrozenIntervalTree, (self.intervals,)
+        return FrozenIntervalTree.from_columns, (
+            list(self.begins), list(self.ends), self.data
+        )
@@ -21,10 +21,14 @@ limitations under the License.
 """
 from .interval import Interval
 from .node import Node
+from . import arrays
+from bisect import bisect_left, bisect_right
 from numbers import Number
 import collections
-from sortedcontainers import SortedDict
+from sortedcontainers import SortedDict, SortedListWithKey
 from copy import copy
+from itertools import chain
+from operator import attrgetter
 from warnings import warn
 
 try:
@@ -33,6 +37,14 @@ except NameError:  # pragma: no cover
     xrange = range
 
 
+# Statistics returned by IntervalTree.search_cache_info()
+CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# Sort order of IntervalTree.sorted_intervals. Unlike sorting Intervals
+# directly, this never compares data fields.
+sort_key = attrgetter('begin', 'end')
+
+
 # noinspection PyBroadException
 class IntervalTree(collections.MutableSet):
     """
@@ -201,6 +213,10 @@ class IntervalTree(collections.MutableSet):
         >>> tree = IntervalTree([Interval(-11, 11), Interval(-5, 15), Interval(5, 17)])
         >>> [iv.begin for iv in sorted(tree)]
         [-11, -5, 5]
+        >>> [iv.begin for iv in tree.iter_sorted()]  # Same, without sorting
+        [-11, -5, 5]
+        >>> [iv.begin for iv in tree.irange(-5, 5)]  # Only begins in [-5, 5)
+        [-5]
         >>> assert tree.items() == set([Interval(-5, 15), Interval(-11, 11), Interval(5, 17)])
 
     Copy- and typecasting, pickling::
@@ -227,6 +243,13 @@ class IntervalTree(collections.MutableSet):
         >>> IntervalTree([Interval(0, 1)]) == IntervalTree([Interval(0, 1, "x")])
         False
     """
+    # update() rebuilds the tree, instead of adding intervals one at a
+    # time, when the batch is larger than this fraction of the tree.
+    # Set to None to always add one at a time.
+    bulk_update_ratio = 0.5
+    # Likewise for remove_overlap() and remove_envelop().
+    bulk_removal_ratio = 0.35
+
     @classmethod
     def from_tuples(cls, tups):
         """
@@ -236,6 +259,38 @@ class IntervalTree(collections.MutableSet):
         ivs = [Interval(*t) for t in tups]
         return IntervalTree(ivs)
 
+    @classmethod
+    def from_sorted(cls, intervals, assume_unique=False):
+        """
+        Create a new IntervalTree from an iterable of Intervals sorted
+        by begin, then by end, without sorting them again. If
+        assume_unique is True, the intervals must also be distinct,
+        and are not checked for duplicates.
+
+        Completes in O(n*log n) time, without comparison sorts of the
+        intervals.
+        :raises ValueError: if the intervals are out of order, or null
+        :rtype: IntervalTree
+        """
+        intervals = list(intervals)
+        if not assume_unique:
+            seen = set()
+            unique = []
+            for iv in intervals:
+                if iv not in seen:
+                    seen.add(iv)
+                    unique.append(iv)
+            intervals = unique
+        for i in range(1, len(intervals)):
+            if sort_key(intervals[i]) < sort_key(intervals[i - 1]):
+                raise ValueError(
+                    "IntervalTree: from_sorted() given out-of-order intervals:"
+                    " {0} after {1}".format(intervals[i], intervals[i - 1])
+                )
+        tree = cls()
+        tree._load_sorted(intervals)
+        return tree
+
     def __init__(self, intervals=None):
         """
         Set up a tree. If intervals is provided, add all the intervals 
@@ -244,27 +299,87 @@ class IntervalTree(collections.MutableSet):
         Completes in O(n*log n) time.
         """
         intervals = set(intervals) if intervals is not None else set()
+        self._load_sorted(sorted(intervals, key=sort_key))
+
+    def _load_sorted(self, intervals):
+        """
+        Replaces the contents of the tree with a list of distinct
+        Intervals sorted by begin, then by end, building the tree and
+        the indexes in bulk.
+        """
         for iv in intervals:
             if iv.is_null():
                 raise ValueError(
                     "IntervalTree: Null Interval objects not allowed in IntervalTree:"
                     " {0}".format(iv)
                 )
-        self.all_intervals = intervals
-        self.top_node = Node.from_intervals(self.all_intervals)
-        self.boundary_table = SortedDict()
-        for iv in self.all_intervals:
-            self._add_boundaries(iv)
+        self.all_intervals = set(intervals)
+        self.top_node = Node.from_sorted_intervals(intervals)
+        self._owner = None  # new nodes belong to nobody else
+        self._shared = False
+        self._mutated()
+        # already sorted, so this does no sorting work
+        self.sorted_intervals = SortedListWithKey(intervals, key=sort_key)
+        boundaries = {}
+        for iv in intervals:
+            boundaries[iv.begin] = boundaries.get(iv.begin, 0) + 1
+            boundaries[iv.end] = boundaries.get(iv.end, 0) + 1
+        self.boundary_table = SortedDict(boundaries)
+
+    def _mutated(self):
+        """
+        Records that the contents of the tree changed, invalidating any
+        cached search results. Also sets up the search cache, disabled,
+        the first time the tree is initialized.
+        """
+        self._interval_arrays = None
+        try:
+            self._generation += 1
+        except AttributeError:  # called from __init__ on a new tree
+            self._generation = 0
+            self.disable_search_cache()
+
+    def _copy_on_write(self):
+        """
+        Called before changing the tree in place. After copy(), gives
+        this tree its own copies of the interval set, sorted index and
+        boundary table, and of the top node.
+
+        Completes in O(n) time after copy(), or O(1) time otherwise.
+        """
+        if self._shared:
+            self.all_intervals = set(self.all_intervals)
+            self.sorted_intervals = self.sorted_intervals.copy()
+            self.boundary_table = self.boundary_table.copy()
+            self._shared = False
+        if self.top_node is not None:
+            self.top_node = self.top_node.owned(self._owner)
 
     def copy(self):
         """
-        Construct a new IntervalTree using shallow copies of the 
-        intervals in the source tree.
-        
-        Completes in O(n*log n) time.
+        Construct a new IntervalTree with the same intervals as this
+        one, without copying anything yet.
+
+        The trees share their nodes, indexes and Interval objects.
+        Changing either tree first copies the indexes, and then only
+        the nodes on the changed paths; each tree takes ownership of
+        the node copies it makes.
+
+        Completes in O(1) time.
         :rtype: IntervalTree
         """
-        return IntervalTree(iv.copy() for iv in self)
+        tree = IntervalTree.__new__(IntervalTree)
+        tree.all_intervals = self.all_intervals
+        tree.top_node = self.top_node
+        tree.sorted_intervals = self.sorted_intervals
+        tree.boundary_table = self.boundary_table
+        tree._mutated()
+        # nodes from before the copy belong to neither tree now
+        self._owner = object()
+        tree._owner = object()
+        self._shared = tree._shared = True
+        return tree
+    __copy__ = copy
     
     def _add_boundaries(self, interval):
         """
@@ -313,12 +428,15 @@ class IntervalTree(collections.MutableSet):
                 " {0}".format(interval)
             )
 
+        self._copy_on_write()
         if not self.top_node:
-            self.top_node = Node.from_interval(interval)
+            self.top_node = Node.from_interval(interval, self._owner)
         else:
             self.top_node = self.top_node.add(interval)
         self.all_intervals.add(interval)
+        self.sorted_intervals.add(interval)
         self._add_boundaries(interval)
+        self._mutated()
     append = add
     
     def addi(self, begin, end, data=None):
@@ -333,12 +451,32 @@ class IntervalTree(collections.MutableSet):
     def update(self, intervals):
         """
         Given an iterable of intervals, add them to the tree.
+
+        If there are more than bulk_update_ratio * n new intervals, the
+        batch is sorted and merged with the tree's intervals, and the
+        tree is rebuilt.
         
-        Completes in O(m*log(n+m), where m = number of intervals to 
-        add.
+        Completes in O(m*log(n+m)) time, or O((n+m)*log(n+m)) time with
+        a smaller constant when rebuilding, where m = number of
+        intervals to add.
         """
-        for iv in intervals:
-            self.add(iv)
+        if self.bulk_update_ratio is None:
+            for iv in intervals:
+                self.add(iv)
+            return
+        # filter the batch, not the tree: difference_update() walks
+        # its whole argument on older Pythons, even for one interval
+        all_intervals = self.all_intervals
+        intervals = set(iv for iv in intervals if iv not in all_intervals)
+        if len(intervals) <= self.bulk_update_ratio * len(self):
+            for iv in intervals:
+                self.add(iv)
+            return
+        intervals = sorted(intervals, key=sort_key)
+        # two sorted runs, which sorted() merges in linear time
+        merged = list(self.sorted_intervals)
+        merged.extend(intervals)
+        self._load_sorted(sorted(merged, key=sort_key))
 
     def extend(self, intervals):
         """
@@ -358,9 +496,12 @@ class IntervalTree(collections.MutableSet):
         if interval not in self:
             #print(self.all_intervals)
             raise ValueError
+        self._copy_on_write()
         self.top_node = self.top_node.remove(interval)
         self.all_intervals.remove(interval)
+        self.sorted_intervals.remove(interval)
         self._remove_boundaries(interval)
+        self._mutated()
         #self.verify()
     
     def removei(self, begin, end, data=None):
@@ -380,9 +521,12 @@ class IntervalTree(collections.MutableSet):
         """
         if interval not in self:
             return
+        self._copy_on_write()
         self.all_intervals.discard(interval)
+        self.sorted_intervals.remove(interval)
         self.top_node = self.top_node.discard(interval)
         self._remove_boundaries(interval)
+        self._mutated()
     
     def discardi(self, begin, end, data=None):
         """
@@ -396,119 +540,292 @@ class IntervalTree(collections.MutableSet):
         """
         Returns a new tree, comprising all intervals in self but not
         in other.
+
+        Completes in O(n + m) time, plus the bulk build.
         """
-        ivs = set()
-        for iv in self:
-            if iv not in other:
-                ivs.add(iv)
-        return IntervalTree(ivs)
+        other = self._as_set(other)
+        return IntervalTree._from_sorted_runs(
+            [iv for iv in self.sorted_intervals if iv not in other]
+        )
 
     def difference_update(self, other):
         """
         Removes all intervals in other from self.
+
+        Completes in O(m*log n) time, or O(n*log n) time with a smaller
+        constant when removing much of the tree.
         """
-        for iv in other:
-            self.discard(iv)
+        self._remove_many(set(iv for iv in other if iv in self.all_intervals))
 
     def union(self, other):
         """
         Returns a new tree, comprising all intervals from self
         and other.
+
+        Completes in O(n + m*log m) time, or O(n + m) time if other is
+        an IntervalTree, plus the bulk build.
         """
-        return IntervalTree(set(self).union(other))
+        return IntervalTree._from_sorted_runs(
+            list(self.sorted_intervals),
+            self._sorted_new(other, self.all_intervals)
+        )
 
     def intersection(self, other):
         """
         Returns a new tree of all intervals common to both self and
         other.
+
+        Completes in O(min(n, m)) time if other is an IntervalTree, or
+        O(n + m) time otherwise, plus the bulk build.
         """
-        ivs = set()
-        shorter, longer = sorted([self, other], key=len)
-        for iv in shorter:
-            if iv in longer:
-                ivs.add(iv)
-        return IntervalTree(ivs)
+        shorter, longer = self, self._as_set(other)
+        if isinstance(other, IntervalTree) and len(other) < len(self):
+            shorter, longer = other, self.all_intervals
+        return IntervalTree._from_sorted_runs(
+            [iv for iv in shorter.sorted_intervals if iv in longer]
+        )
 
     def intersection_update(self, other):
         """
         Removes intervals from self unless they also exist in other.
+
+        Completes in O(n + m) time, plus the removals.
         """
-        for iv in self:
-            if iv not in other:
-                self.remove(iv)
+        other = self._as_set(other)
+        self._remove_many(set(iv for iv in self.all_intervals if iv not in other))
 
     def symmetric_difference(self, other):
         """
         Return a tree with elements only in self or other but not
         both.
+
+        Completes in O(n + m*log m) time, or O(n + m) time if other is
+        an IntervalTree, plus the bulk build.
         """
-        if not isinstance(other, set): other = set(other)
-        me = set(self)
-        ivs = me - other + (other - me)
-        return IntervalTree(ivs)
+        other_set = self._as_set(other)
+        if not isinstance(other, IntervalTree):
+            other = other_set  # other may be a one-shot iterable
+        return IntervalTree._from_sorted_runs(
+            [iv for iv in self.sorted_intervals if iv not in other_set],
+            self._sorted_new(other, self.all_intervals)
+        )
 
     def symmetric_difference_update(self, other):
         """
         Throws out all intervals except those only in self or other,
         not both.
+
+        Completes in O(m*log n) time, or O((n+m)*log(n+m)) time with a
+        smaller constant when changing much of the tree.
         """
         other = set(other)
-        for iv in self:
-            if iv in other:
-                self.remove(iv)
-                other.remove(iv)
+        common = other & self.all_intervals
+        other.difference_update(common)
+        self._remove_many(common)
+        self.update(other)
+
+    def __or__(self, other):
+        if not isinstance(other, collections.Iterable):
+            return NotImplemented
+        return self.union(other)
+
+    def __and__(self, other):
+        if not isinstance(other, collections.Iterable):
+            return NotImplemented
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        if not isinstance(other, collections.Iterable):
+            return NotImplemented
+        return self.difference(other)
+
+    def __xor__(self, other):
+        if not isinstance(other, collections.Iterable):
+            return NotImplemented
+        return self.symmetric_difference(other)
+
+    def __ior__(self, other):
         self.update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+    @staticmethod
+    def _as_set(other):
+        """
+        Returns other's intervals as a set, without copying them if
+        other is an IntervalTree or a set.
+        :rtype: set of Interval
+        """
+        if isinstance(other, IntervalTree):
+            return other.all_intervals
+        if isinstance(other, (set, frozenset)):
+            return other
+        return set(other)
+
+    @staticmethod
+    def _sorted_new(other, existing):
+        """
+        Returns the distinct intervals in other that are not in
+        existing, sorted by begin, then by end.
+        :rtype: list of Interval
+        """
+        if isinstance(other, IntervalTree):
+            return [iv for iv in other.sorted_intervals if iv not in existing]
+        return sorted(
+            (iv for iv in IntervalTree._as_set(other) if iv not in existing),
+            key=sort_key
+        )
+
+    @staticmethod
+    def _from_sorted_runs(*runs):
+        """
+        Builds a tree from disjoint lists of distinct Intervals, each
+        sorted by begin, then by end.
+        :rtype: IntervalTree
+        """
+        merged = []
+        for run in runs:
+            merged.extend(run)
+        if len(runs) > 1:
+            # sorted runs, which sorted() merges in linear time
+            merged.sort(key=sort_key)
+        tree = IntervalTree()
+        tree._load_sorted(merged)
+        return tree
+
+    def _remove_many(self, intervals):
+        """
+        Removes a set of Intervals that are all in the tree, updating
+        the boundary table once for the batch. The tree nodes are
+        updated in one pass, see Node.remove_many(). If there are more
+        than bulk_removal_ratio * n of them, rebuilds the tree from the
+        remaining intervals instead.
+
+        Completes in O(m*log n) time, or O(n*log n) time with a smaller
+        constant when rebuilding.
+        """
+        if not intervals:
+            return
+        ratio = self.bulk_removal_ratio
+        if ratio is not None and len(intervals) > ratio * len(self):
+            self._load_sorted([iv for iv in self.sorted_intervals if iv not in intervals])
+            return
+
+        self._copy_on_write()
+        self.top_node = self.top_node.owned(self._owner).remove_many(intervals)
+        counts = {}
+        for iv in intervals:
+            self.sorted_intervals.remove(iv)
+            counts[iv.begin] = counts.get(iv.begin, 0) + 1
+            counts[iv.end] = counts.get(iv.end, 0) + 1
+        self.all_intervals.difference_update(intervals)
+        for boundary, count in counts.items():
+            count = self.boundary_table[boundary] - count
+            if count:
+                self.boundary_table[boundary] = count
+            else:
+                del self.boundary_table[boundary]
+        self._mutated()
 
     def remove_overlap(self, begin, end=None):
         """
         Removes all intervals overlapping the given point or range.
+        See _remove_many() for how large removals are handled.
         
-        Completes in O((r+m)*log n) time, where:
+        Completes in O(m*log n) time, where:
           * n = size of the tree
           * m = number of matches
-          * r = size of the search range (this is 1 for a point)
         """
-        hitlist = self.search(begin, end)
-        for iv in hitlist: 
-            self.remove(iv)
+        self._remove_many(self.search(begin, end))
 
     def remove_envelop(self, begin, end):
         """
         Removes all intervals completely enveloped in the given range.
+        See _remove_many() for how large removals are handled.
         
-        Completes in O((r+m)*log n) time, where:
+        Completes in O(m*log n) time, where:
           * n = size of the tree
           * m = number of matches
-          * r = size of the search range (this is 1 for a point)
         """
-        hitlist = self.search(begin, end, strict=True)
-        for iv in hitlist:
-            self.remove(iv)
+        self._remove_many(self.search(begin, end, strict=True))
 
     def chop(self, begin, end, datafunc=None):
         """
         Like remove_envelop(), but trims back Intervals hanging into
-        the chopped area so that nothing overlaps.
+        the chopped area so that nothing overlaps. If specified, uses
+        datafunc(interval, islower=True/False) to set the data field of
+        the trimmed Intervals.
+
+        Completes in O(m*log n) time, where:
+          * n = size of the tree
+          * m = number of intervals overlapping the range
         """
+        self.chop_many([(begin, end)], datafunc)
+
+    def chop_many(self, ranges, datafunc=None):
+        """
+        Chops out every (begin, end) range in an iterable, as chop(),
+        in one search. Where an Interval spans several ranges, the
+        piece keeping its begin is the lower piece; all the others are
+        upper pieces, for datafunc.
+
+        Completes in O(m*log n + r*log r) time, where:
+          * n = size of the tree
+          * m = number of intervals overlapping the ranges
+          * r = number of ranges
+        """
+        # disjoint, sorted ranges covering the same points
+        merged = []
+        for begin, end in sorted((begin, end) for begin, end in ranges if begin < end):
+            if merged and begin <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1][1] = end
+            else:
+                merged.append([begin, end])
+        if not merged:
+            return
+        begins = [begin for begin, end in merged]
+
+        hitlist = set()
+        for hits in self.search_ranges(merged):
+            hitlist.update(hits)
         insertions = set()
-        begin_hits = [iv for iv in self[begin] if iv.begin < begin]
-        end_hits = [iv for iv in self[end] if iv.end > end]
+        for iv in hitlist:
+            # gaps between the ranges overlapping iv
+            i = max(bisect_right(begins, iv.begin) - 1, 0)
+            lower = iv.begin
+            while i < len(merged) and merged[i][0] < iv.end:
+                if lower < merged[i][0]:
+                    insertions.add(self._piece(iv, lower, merged[i][0], datafunc))
+                lower = max(lower, merged[i][1])
+                i += 1
+            if lower < iv.end:
+                insertions.add(self._piece(iv, lower, iv.end, datafunc))
+        self._remove_many(hitlist)
+        self.update(insertions)
 
+    @staticmethod
+    def _piece(interval, begin, end, datafunc):
+        """
+        Returns the piece [begin, end) of interval, with data set by
+        datafunc(interval, islower) if given. The lower piece is the
+        one keeping interval's begin.
+        :rtype: Interval
+        """
         if datafunc:
-            for iv in begin_hits:
-                insertions.add(Interval(iv.begin, begin, datafunc(iv, True)))
-            for iv in end_hits:
-                insertions.add(Interval(end, iv.end, datafunc(iv, False)))
-        else:
-            for iv in begin_hits:
-                insertions.add(Interval(iv.begin, begin, iv.data))
-            for iv in end_hits:
-                insertions.add(Interval(end, iv.end, iv.data))
-
-        self.remove_envelop(begin, end)
-        self.difference_update(begin_hits)
-        self.difference_update(end_hits)
-        self.update(insertions)
+            return Interval(begin, end, datafunc(interval, begin == interval.begin))
+        return Interval(begin, end, interval.data)
 
     def slice(self, point, datafunc=None):
         """
@@ -518,18 +835,37 @@ class IntervalTree(collections.MutableSet):
         :param point: where to slice
         :param datafunc(interval, isupper): callable returning a new
         value for the interval's data field
+
+        Completes in O(m*log n) time, where:
+          * n = size of the tree
+          * m = number of intervals containing point
         """
-        hitlist = set(iv for iv in self[point] if iv.begin < point)
+        self.slice_many([point], datafunc)
+
+    def slice_many(self, points, datafunc=None):
+        """
+        Splits Intervals at every point in an iterable, as slice(), in
+        one sweep through the tree. An Interval containing k of the
+        points becomes k + 1 pieces; the first is the lower piece and
+        all the others are upper pieces, for datafunc.
+
+        Completes in O(m*log n + p*log p) time, where:
+          * n = size of the tree
+          * m = number of pieces
+          * p = number of points
+        """
+        points = sorted(set(points))
+        hitlist = set()
+        for point, hits in zip(points, self.search_many(points)):
+            hitlist.update(iv for iv in hits if iv.begin < point)
         insertions = set()
-        if datafunc:
-            for iv in hitlist:
-                insertions.add(Interval(iv.begin, point, datafunc(iv, True)))
-                insertions.add(Interval(point, iv.end, datafunc(iv, False)))
-        else:
-            for iv in hitlist:
-                insertions.add(Interval(iv.begin, point, iv.data))
-                insertions.add(Interval(point, iv.end, iv.data))
-        self.difference_update(hitlist)
+        for iv in hitlist:
+            lower = iv.begin
+            for i in xrange(bisect_right(points, iv.begin), bisect_left(points, iv.end)):
+                insertions.add(self._piece(iv, lower, points[i], datafunc))
+                lower = points[i]
+            insertions.add(self._piece(iv, lower, iv.end, datafunc))
+        self._remove_many(hitlist)
         self.update(insertions)
 
     def clear(self):
@@ -543,23 +879,43 @@ class IntervalTree(collections.MutableSet):
     def find_nested(self):
         """
         Returns a dictionary mapping parent intervals to sets of 
-        intervals overlapped by and contained in the parent.
+        intervals overlapped by and contained in the parent. Of two
+        intervals with the same range, only one is the parent of the
+        other.
+        
+        Sweeps over the intervals by begin, then by longest first,
+        keeping the intervals that may still contain later ones sorted
+        by end.
         
-        Completes in O(n^2) time.
+        Completes in O(n*log n + m) time, where:
+          * n = size of the tree
+          * m = number of (parent, child) pairs
         :rtype: dict of [Interval, set of Interval]
         """
         result = {}
-        
-        def add_if_nested():
-            if parent.contains_interval(child):
+        open_ivs = SortedListWithKey(key=attrgetter('end'))
+
+        def visit(child):
+            # intervals ending at or before child.begin contain nothing
+            # from here on
+            del open_ivs[:open_ivs.bisect_key_right(child.begin)]
+            for parent in open_ivs.islice(open_ivs.bisect_key_left(child.end)):
                 if parent not in result:
                     result[parent] = set()
                 result[parent].add(child)
-                
-        long_ivs = sorted(self.all_intervals, key=Interval.length, reverse=True)
-        for i, parent in enumerate(long_ivs):
-            for child in long_ivs[i + 1:]:
-                add_if_nested()
+            open_ivs.add(child)
+
+        # sorted_intervals is by begin, then end; reverse each group of
+        # equal begins so that parents come before their children
+        group = []
+        for iv in self.sorted_intervals:
+            if group and iv.begin != group[0].begin:
+                for child in reversed(group):
+                    visit(child)
+                group = []
+            group.append(iv)
+        for child in reversed(group):
+            visit(child)
         return result
     
     def overlaps(self, begin, end=None):
@@ -567,8 +923,7 @@ class IntervalTree(collections.MutableSet):
         Returns whether some interval in the tree overlaps the given
         point or range.
         
-        Completes in O(r*log n) time, where r is the size of the
-        search range.
+        Completes in O(log n) time.
         :rtype: bool
         """
         if end is not None:
@@ -595,46 +950,57 @@ class IntervalTree(collections.MutableSet):
         range. Returns False if given a null interval over which to
         test.
         
-        Completes in O(r*log n) time, where r is the range length and n
-        is the table size.
+        Completes in O(log n) time.
         :rtype: bool
         """
         if self.is_empty():
             return False
         elif begin >= end:
             return False
-        elif self.overlaps_point(begin):
+        # Any boundary strictly inside the range belongs to an interval
+        # that overlaps it. Otherwise, only an interval spanning the
+        # whole range can overlap, and that one contains begin.
+        boundary_table = self.boundary_table
+        if boundary_table.bisect_right(begin) < boundary_table.bisect_left(end):
             return True
-        return any(
-            self.overlaps_point(bound) 
-            for bound in self.boundary_table 
-            if begin < bound < end
-        )
+        return self.overlaps_point(begin)
     
     def split_overlaps(self):
         """
         Finds all intervals with overlapping ranges and splits them
         along the range boundaries.
         
-        Completes in worst-case O(n^2*log n) time (many interval 
-        boundaries are inside many intervals), best-case O(n*log n)
-        time (small number of overlaps << n per interval).
+        Sweeps over the boundaries once, keeping the set of intervals
+        that cover the current segment, and builds the new tree from
+        the pieces in bulk.
+        
+        Completes in O(n*log n + m) time, where:
+          * n = size of the tree
+          * m = number of pieces
         """
         if not self:
             return
         if len(self.boundary_table) == 2:
             return
 
-        bounds = sorted(self.boundary_table)  # get bound locations
-
-        new_ivs = set()
+        bounds = list(self.boundary_table)
+        starts = list(self.sorted_intervals)
+        stops = sorted(self.all_intervals, key=attrgetter('end'))
+        i = j = 0
+        active = set()
+        new_ivs = []
         for lbound, ubound in zip(bounds[:-1], bounds[1:]):
-            for iv in self[lbound]:
-                new_ivs.add(Interval(lbound, ubound, iv.data))
+            while stops[j].end <= lbound:
+                active.remove(stops[j])
+                j += 1
+            while i < len(starts) and starts[i].begin <= lbound:
+                active.add(starts[i])
+                i += 1
+            new_ivs.extend(set(Interval(lbound, ubound, iv.data) for iv in active))
 
-        self.__init__(new_ivs)
+        self._load_sorted(new_ivs)
 
-    def merge_overlaps(self, data_reducer=None, data_initializer=None):
+    def merge_overlaps(self, data_reducer=None, data_initializer=None, begin=None, end=None):
         """
         Finds all intervals with overlapping ranges and merges them
         into a single interval. If provided, uses data_reducer and
@@ -656,45 +1022,19 @@ class IntervalTree(collections.MutableSet):
         data_initiazer created with
             copy.copy(data_initializer).
 
-        Completes in O(n*logn).
+        If begin or end is given, only merges the groups of
+        intervals that iter_merged_overlaps(begin, end) would merge,
+        leaving the rest of the tree alone.
+
+        Completes in O(n*logn), or O(m*log n) time for m intervals in
+        the merged groups when given a range.
         """
         if not self:
             return
+        series = self._iter_overlap_series(begin, end)
+        self._merge_series(series, data_reducer, data_initializer, begin, end)
 
-        sorted_intervals = sorted(self.all_intervals)  # get sorted intervals
-        merged = []
-        # use mutable object to allow new_series() to modify it
-        current_reduced = [None]
-        higher = None  # iterating variable, which new_series() needs access to
-
-        def new_series():
-            if data_initializer is None:
-                current_reduced[0] = higher.data
-                merged.append(higher)
-                return
-            else:  # data_initializer is not None
-                current_reduced[0] = copy(data_initializer)
-                current_reduced[0] = data_reducer(current_reduced[0], higher.data)
-                merged.append(Interval(higher.begin, higher.end, current_reduced[0]))
-
-        for higher in sorted_intervals:
-            if merged:  # series already begun
-                lower = merged[-1]
-                if higher.begin <= lower.end:  # should merge
-                    upper_bound = max(lower.end, higher.end)
-                    if data_reducer is not None:
-                        current_reduced[0] = data_reducer(current_reduced[0], higher.data)
-                    else:  # annihilate the data, since we don't know how to merge it
-                        current_reduced[0] = None
-                    merged[-1] = Interval(lower.begin, upper_bound, current_reduced[0])
-                else:
-                    new_series()
-            else:  # not merged; is first of Intervals to merge
-                new_series()
-
-        self.__init__(merged)
-
-    def merge_equals(self, data_reducer=None, data_initializer=None):
+    def merge_equals(self, data_reducer=None, data_initializer=None, begin=None, end=None):
         """
         Finds all intervals with equal ranges and merges them
         into a single interval. If provided, uses data_reducer and
@@ -716,43 +1056,176 @@ class IntervalTree(collections.MutableSet):
         data_initiazer created with
             copy.copy(data_initializer).
 
-        Completes in O(n*logn).
+        If begin or end is given, only merges the intervals
+        overlapping [begin, end), leaving the rest of the tree alone.
+
+        Completes in O(n*logn), or O(m*log n) time for m intervals
+        overlapping the range when given one.
         """
         if not self:
             return
+        series = self._iter_equal_series(begin, end)
+        self._merge_series(series, data_reducer, data_initializer, begin, end)
 
-        sorted_intervals = sorted(self.all_intervals)  # get sorted intervals
-        merged = []
-        # use mutable object to allow new_series() to modify it
-        current_reduced = [None]
-        higher = None  # iterating variable, which new_series() needs access to
-
-        def new_series():
-            if data_initializer is None:
-                current_reduced[0] = higher.data
-                merged.append(higher)
+    def iter_merged_overlaps(self, begin=None, end=None, data_reducer=None, data_initializer=None):
+        """
+        Yields, in order, the Intervals that merge_overlaps() would
+        leave in the tree, without changing the tree. If begin or end
+        is given, yields only the merged Intervals overlapping
+        [begin, end); each is still merged from its whole group of
+        overlapping intervals, even those outside the range.
+
+        Only the group being merged is held in memory.
+
+        Completes in O(n) time, or O(m*log n) time for m intervals in
+        the merged groups when given a range.
+        :rtype: collections.Iterable[Interval]
+        """
+        for series in self._iter_overlap_series(begin, end):
+            yield self._reduce_series(series, data_reducer, data_initializer)
+
+    def iter_merged_equals(self, begin=None, end=None, data_reducer=None, data_initializer=None):
+        """
+        Yields, in order, the Intervals that merge_equals() would
+        leave in the tree, without changing the tree. If begin or end
+        is given, yields only those overlapping [begin, end).
+
+        Completes in O(n) time, or O(log n + m) time for m intervals
+        overlapping the range when given one.
+        :rtype: collections.Iterable[Interval]
+        """
+        for series in self._iter_equal_series(begin, end):
+            yield self._reduce_series(series, data_reducer, data_initializer)
+
+    def _merge_series(self, series, data_reducer, data_initializer, begin, end):
+        """
+        Replaces each list of intervals in series with its reduction.
+        """
+        if begin is None and end is None:
+            self._load_sorted([
+                self._reduce_series(ivs, data_reducer, data_initializer)
+                for ivs in series
+            ])
+            return
+        removals = set()
+        insertions = []
+        for ivs in series:
+            if len(ivs) == 1 and data_initializer is None:
+                continue  # nothing to merge
+            removals.update(ivs)
+            insertions.append(self._reduce_series(ivs, data_reducer, data_initializer))
+        self._remove_many(removals)
+        self.update(insertions)
+
+    @staticmethod
+    def _reduce_series(series, data_reducer, data_initializer):
+        """
+        Merges a list of intervals, sorted as by sorted(), into one.
+        See merge_overlaps() for how data fields are combined.
+        :rtype: Interval
+        """
+        first = series[0]
+        if data_initializer is None:
+            if len(series) == 1:
+                return first
+            reduced = first.data
+        else:
+            reduced = data_reducer(copy(data_initializer), first.data)
+        upper_bound = first.end
+        for i in xrange(1, len(series)):
+            higher = series[i]
+            if data_reducer is not None:
+                reduced = data_reducer(reduced, higher.data)
+            else:  # annihilate the data, since we don't know how to merge it
+                reduced = None
+            upper_bound = max(upper_bound, higher.end)
+        return Interval(first.begin, upper_bound, reduced)
+
+    def _iter_overlap_series(self, begin=None, end=None):
+        """
+        Yields lists of intervals that merge_overlaps() merges into
+        one, in order, for the groups whose merged Interval overlaps
+        [begin, end). Intervals that touch count as overlapping.
+        :rtype: collections.Iterable[list of Interval]
+        """
+        if begin is not None and end is not None and begin >= end:
+            return
+        lower = None
+        if begin is not None and self.boundary_table:
+            # walk left until no interval reaches past lower, so that
+            # the first group is whole
+            lower = begin
+            boundary_table = self.boundary_table
+            while True:
+                i = boundary_table.bisect_left(lower)
+                if i == 0:
+                    break
+                hits = self._search(boundary_table.iloc[i - 1], lower)
+                if not any(iv.end >= lower for iv in hits):
+                    break
+                lower = min(iv.begin for iv in hits)
+
+        series = []
+        upper_bound = None
+        for iv in self._iter_full_order(self.irange(lower)):
+            if series and iv.begin <= upper_bound:
+                series.append(iv)
+                upper_bound = max(upper_bound, iv.end)
+                continue
+            if series and (begin is None or upper_bound > begin):
+                yield series
+            if end is not None and iv.begin >= end:
                 return
-            else:  # data_initializer is not None
-                current_reduced[0] = copy(data_initializer)
-                current_reduced[0] = data_reducer(current_reduced[0], higher.data)
-                merged.append(Interval(higher.begin, higher.end, current_reduced[0]))
-
-        for higher in sorted_intervals:
-            if merged:  # series already begun
-                lower = merged[-1]
-                if higher.range_matches(lower):  # should merge
-                    upper_bound = max(lower.end, higher.end)
-                    if data_reducer is not None:
-                        current_reduced[0] = data_reducer(current_reduced[0], higher.data)
-                    else:  # annihilate the data, since we don't know how to merge it
-                        current_reduced[0] = None
-                    merged[-1] = Interval(lower.begin, upper_bound, current_reduced[0])
-                else:
-                    new_series()
-            else:  # not merged; is first of Intervals to merge
-                new_series()
+            series = [iv]
+            upper_bound = iv.end
+        if series and (begin is None or upper_bound > begin):
+            yield series
 
-        self.__init__(merged)
+    def _iter_equal_series(self, begin=None, end=None):
+        """
+        Yields lists of intervals with equal ranges, in order, for
+        the intervals that overlap [begin, end).
+        :rtype: collections.Iterable[list of Interval]
+        """
+        if begin is not None and end is not None and begin >= end:
+            return
+        if begin is None:
+            ivs = self._iter_full_order(self.irange(None, end))
+        else:
+            # intervals beginning before begin come first
+            before = sorted(iv for iv in self._search(begin) if iv.begin < begin)
+            ivs = chain(before, self._iter_full_order(self.irange(begin, end)))
+        series = []
+        for iv in ivs:
+            if series and iv.range_matches(series[0]):
+                series.append(iv)
+                continue
+            if series:
+                yield series
+            series = [iv]
+        if series:
+            yield series
+
+    @staticmethod
+    def _iter_full_order(intervals):
+        """
+        Given intervals sorted by begin, then end, yields them in the
+        order of sorted(), which also sorts by data field.
+        :rtype: collections.Iterable[Interval]
+        """
+        ties = []
+        for iv in intervals:
+            if ties and not iv.range_matches(ties[0]):
+                if len(ties) > 1:
+                    ties.sort()
+                for tie in ties:
+                    yield tie
+                ties = []
+            ties.append(iv)
+        if len(ties) > 1:
+            ties.sort()
+        for tie in ties:
+            yield tie
 
     def items(self):
         """
@@ -778,42 +1251,285 @@ class IntervalTree(collections.MutableSet):
         if strict is True, returns the set of all intervals fully
         contained in the range [begin, end].
         
-        Completes in O(m + k*log n) time, where:
+        Completes in O(log n + m) time, where:
           * n = size of the tree
           * m = number of matches
-          * k = size of the search range (this is 1 for a point)
         :rtype: set of Interval
         """
+        cache = self._search_cache
+        if cache is None:
+            return self._search(begin, end, strict)
+
+        if self._search_cache_generation != self._generation:
+            cache.clear()
+            self._search_cache_generation = self._generation
+        key = (begin, end, strict)
+        try:
+            result = cache.pop(key)  # re-inserted below as most recent
+        except KeyError:
+            self._search_cache_misses += 1
+            result = self._search(begin, end, strict)
+            if self._search_cache_maxsize is not None and \
+                    len(cache) >= self._search_cache_maxsize:
+                cache.popitem(last=False)
+        except TypeError:  # unhashable query
+            return self._search(begin, end, strict)
+        else:
+            self._search_cache_hits += 1
+        cache[key] = result
+        return set(result)  # never hand out the cached set itself
+
+    def _search(self, begin, end=None, strict=False):
+        """
+        Uncached implementation of search().
+        """
         root = self.top_node
         if not root:
             return set()
         if end is None:
             try:
                 iv = begin
-                return self.search(iv.begin, iv.end, strict=strict)
+                return self._search(iv.begin, iv.end, strict=strict)
             except:
                 return root.search_point(begin, set())
         elif begin >= end:
             return set()
+        elif strict:
+            return root.search_envelop(begin, end, set())
         else:
-            result = root.search_point(begin, set())
-
-            boundary_table = self.boundary_table
-            bound_begin = boundary_table.bisect_left(begin)
-            bound_end = boundary_table.bisect_left(end)  # exclude final end bound
-            result.update(root.search_overlap(
-                # slice notation is slightly slower
-                boundary_table.iloc[index] for index in xrange(bound_begin, bound_end)
-            ))
-
-            # TODO: improve strict search to use node info instead of less-efficient filtering
-            if strict:
-                result = set(
-                    iv for iv in result
-                    if iv.begin >= begin and iv.end <= end
-                )
-            return result
+            return root.search_range(begin, end, set())
     
+    def enable_search_cache(self, maxsize=128):
+        """
+        Starts caching the results of search(), and therefore of
+        tree[point] and tree[begin:end], keyed by (begin, end, strict).
+        Keeps up to maxsize results, discarding the least recently
+        used first; if maxsize is None, the cache is unbounded.
+        
+        Any change to the tree invalidates the whole cache. Cached
+        results are copied before being returned, so a hit still
+        completes in O(m) time, where m is the number of matches.
+        Resets the statistics returned by search_cache_info().
+        """
+        self._search_cache = collections.OrderedDict()
+        self._search_cache_maxsize = maxsize
+        self._search_cache_generation = self._generation
+        self._search_cache_hits = 0
+        self._search_cache_misses = 0
+
+    def disable_search_cache(self):
+        """
+        Stops caching the results of search(), and discards the cache.
+        """
+        self._search_cache = None
+        self._search_cache_maxsize = 0
+        self._search_cache_hits = 0
+        self._search_cache_misses = 0
+
+    def search_cache_info(self):
+        """
+        Returns the search cache statistics as a named tuple of
+        (hits, misses, maxsize, currsize). These are all 0 if the cache
+        is disabled.
+        :rtype: CacheInfo
+        """
+        cache = self._search_cache
+        if cache is None or self._search_cache_generation != self._generation:
+            currsize = 0
+        else:
+            currsize = len(cache)
+        return CacheInfo(
+            self._search_cache_hits,
+            self._search_cache_misses,
+            self._search_cache_maxsize,
+            currsize
+        )
+
+    def iter_search(self, begin, end=None, strict=False, limit=None):
+        """
+        Like search(), but yields the matching intervals one at a time,
+        in no particular order, instead of building a set. If limit is
+        given, stops after yielding that many intervals.
+        
+        Finding the first match takes O(log n) time, so callers that
+        stop early only pay for the matches they consume. The tree
+        must not be modified while iterating.
+        :rtype: collections.Iterable[Interval]
+        """
+        root = self.top_node
+        if not root or (limit is not None and limit <= 0):
+            return
+        if end is None:
+            try:
+                begin, end = begin.begin, begin.end
+            except AttributeError:
+                hits = root.iter_point(begin)
+        if end is not None:
+            if begin >= end:
+                return
+            elif strict:
+                hits = root.iter_envelop(begin, end)
+            else:
+                hits = root.iter_range(begin, end)
+
+        count = 0
+        for iv in hits:
+            yield iv
+            count += 1
+            if count == limit:
+                return
+
+    def nearest(self, point_or_range, k=1):
+        """
+        Returns a list of the k intervals nearest to the given point or
+        range (any object with begin and end attributes, such as an
+        Interval), nearest first. Intervals that overlap or touch the
+        point or range have distance 0; ties are in no particular
+        order. Returns fewer than k intervals if the tree is smaller.
+        
+        Completes in O((log n + k)*log n) time.
+        :rtype: list of Interval
+        """
+        if not self.top_node or k <= 0:
+            return []
+        try:
+            begin, end = point_or_range.begin, point_or_range.end
+        except AttributeError:
+            begin = end = point_or_range
+        result = []
+        for distance, iv in self.top_node.iter_nearest(begin, end):
+            result.append(iv)
+            if len(result) == k:
+                break
+        return result
+
+    def count_overlap(self, begin, end=None):
+        """
+        Returns the number of intervals overlapping the given point or
+        range. Equivalent to len(tree.search(begin, end)), but does not
+        build the result set.
+        
+        Completes in O(log n + m) time, where m is the number of
+        intervals stored in the visited nodes.
+        :rtype: int
+        """
+        root = self.top_node
+        if not root:
+            return 0
+        if end is None:
+            try:
+                begin, end = begin.begin, begin.end
+            except AttributeError:
+                return root.count_point(begin)
+        if begin >= end:
+            return 0
+        return root.count_range(begin, end)
+
+    def search_many(self, points):
+        """
+        Returns a list of sets, where the i-th set holds all intervals
+        containing the i-th of the given points. Equivalent to
+        [tree[p] for p in points], but sorts the points once and
+        sweeps them through the tree together, visiting each node at
+        most once.
+        
+        Completes in O(p*log p + n*log p + m) time in the worst case,
+        where:
+          * n = size of the tree
+          * p = number of points
+          * m = total number of matches
+        :rtype: list of set of Interval
+        """
+        points = list(points)
+        order = sorted(xrange(len(points)), key=points.__getitem__)
+        sorted_points = [points[i] for i in order]
+        found = [set() for _ in order]
+        if self.top_node and found:
+            self.top_node.search_points(sorted_points, 0, len(found), found)
+
+        result = [None] * len(found)
+        for i, hits in zip(order, found):
+            result[i] = hits
+        return result
+
+    def search_ranges(self, ranges, strict=False):
+        """
+        Returns a list of sets, where the i-th set holds the result of
+        search(begin, end, strict) for the i-th (begin, end) pair in
+        ranges. The ranges are pushed through the tree together, so
+        each node is visited at most once for the whole batch.
+        
+        Completes in O(r*log r + k) time, where:
+          * r = number of ranges
+          * k = total number of (node, range) pairs visited, which is
+            at most the cost of searching each range separately
+        :rtype: list of set of Interval
+        """
+        results = []
+        windows = []
+        for begin, end in ranges:
+            if begin < end:
+                windows.append((begin, end, len(results)))
+            results.append(set())
+        if self.top_node and windows:
+            windows.sort()
+            self.top_node.search_ranges(windows, results, strict)
+        return results
+
+    def get_interval_arrays(self):
+        """
+        Returns NumPy arrays (begins, ends) of the bounds of the
+        intervals in the tree, in iter_sorted() order. These are the
+        intervals that the indices returned by search_points_array()
+        and search_ranges_array() refer to. The arrays are built once
+        and reused until the tree changes; do not modify them.
+        
+        Requires NumPy. Completes in O(n) time, or O(1) if the tree
+        has not changed since the last call.
+        :rtype: tuple of numpy.ndarray
+        """
+        arrays.require_numpy()
+        if self._interval_arrays is None:
+            self._interval_arrays = arrays.interval_arrays(self.sorted_intervals)
+        return self._interval_arrays
+
+    def search_points_array(self, points):
+        """
+        Vectorized version of search_many(). Given a NumPy array (or
+        any sequence) of points, returns (offsets, indices) arrays in
+        compressed sparse row form: the intervals containing points[j]
+        are those at positions indices[offsets[j]:offsets[j + 1]] of
+        list(tree.iter_sorted()), in ascending order.
+        
+        Requires NumPy and numeric interval bounds. Completes in
+        O((n + p)*log p + m*log m) time, where:
+          * n = size of the tree
+          * p = number of points
+          * m = total number of matches
+        :rtype: tuple of numpy.ndarray
+        """
+        begins, ends = self.get_interval_arrays()
+        return arrays.search_points(begins, ends, points)
+
+    def search_ranges_array(self, begins, ends, strict=False):
+        """
+        Vectorized version of search_ranges(). Given NumPy arrays (or
+        any sequences) of range begins and ends, returns (offsets,
+        indices) arrays in compressed sparse row form: the intervals
+        overlapping (or, if strict, enveloped by) range j are those at
+        positions indices[offsets[j]:offsets[j + 1]] of
+        list(tree.iter_sorted()), in ascending order.
+        
+        Requires NumPy and numeric interval bounds. Completes in
+        O((n + r)*log(n + r) + m*log m) time, where:
+          * n = size of the tree
+          * r = number of ranges
+          * m = total number of matches
+        :rtype: tuple of numpy.ndarray
+        """
+        iv_begins, iv_ends = self.get_interval_arrays()
+        return arrays.search_ranges(iv_begins, iv_ends, begins, ends, strict)
+
     def begin(self):
         """
         Returns the lower bound of the first interval in the tree.
@@ -907,6 +1623,15 @@ class IntervalTree(collections.MutableSet):
                     " {0}".format(iv)
                 )
 
+            ## sorted_intervals holds the same intervals, in order
+            assert len(self.sorted_intervals) == len(self.all_intervals), \
+                'Error: sorted_intervals is out of sync with the tree!'
+            assert set(self.sorted_intervals) == self.all_intervals, \
+                'Error: sorted_intervals is out of sync with the tree!'
+            keys = [sort_key(iv) for iv in self.sorted_intervals]
+            assert keys == sorted(keys), \
+                'Error: sorted_intervals is out of order!'
+
             ## Reconstruct boundary_table
             bound_check = {}
             for iv in self:
@@ -938,6 +1663,8 @@ class IntervalTree(collections.MutableSet):
             ## Verify empty tree
             assert not self.boundary_table, \
                 "Error: boundary table should be empty!"
+            assert not self.sorted_intervals, \
+                "Error: sorted_intervals should be empty!"
             assert self.top_node is None, \
                 "Error: top_node isn't None!"
 
@@ -981,10 +1708,9 @@ class IntervalTree(collections.MutableSet):
         Returns a set of all intervals overlapping the given index or 
         slice.
         
-        Completes in O(k * log(n) + m) time, where:
+        Completes in O(log n + m) time, where:
           * n = size of the tree
           * m = number of matches
-          * k = size of the search range (this is 1 for a point)
         :rtype: set of Interval
         """
         try:
@@ -1051,6 +1777,33 @@ class IntervalTree(collections.MutableSet):
         """
         return self.all_intervals.__iter__()
     iter = __iter__
+
+    def iter_sorted(self):
+        """
+        Returns an iterator over all the intervals in the tree, sorted
+        by begin, then by end. Intervals with equal ranges but
+        different data are returned in no particular order.
+        
+        Completes in O(1) time, without sorting.
+        :rtype: collections.Iterable[Interval]
+        """
+        return iter(self.sorted_intervals)
+
+    def irange(self, begin=None, end=None):
+        """
+        Returns an iterator over the intervals whose begin lies in
+        [begin, end), in the same order as iter_sorted(). If begin or
+        end is None, the range is unbounded on that side.
+        
+        Completes in O(log n + m) time, where m is the number of
+        intervals returned.
+        :rtype: collections.Iterable[Interval]
+        """
+        return self.sorted_intervals.irange_key(
+            None if begin is None else (begin,),
+            None if end is None else (end,),
+            inclusive=(True, False)
+        )
     
     def __len__(self):
         """
@@ -1090,5 +1843,5 @@ class IntervalTree(collections.MutableSet):
         For pickle-ing.
         :rtype: tuple
         """
-        return IntervalTree, (sorted(self.all_intervals),)
+        return IntervalTree, (list(self.sorted_intervals),)
 
@@ -21,6 +21,14 @@ limitations under the License.
 """
 from operator import attrgetter
 from math import floor, log
+from bisect import bisect_left, bisect_right
+from heapq import heappush, heappop
+from sortedcontainers import SortedListWithKey
+
+try:
+    xrange  # Python 2?
+except NameError:  # pragma: no cover
+    xrange = range
 
 
 def l2(num):
@@ -31,57 +39,313 @@ def l2(num):
     return log(num, 2)
 
 
+# Centers holding at most this many intervals are kept in a tuple, and
+# larger ones in a SortedCenter. Most nodes hold one or two intervals,
+# and a small tuple takes a fraction of the memory of a set.
+SMALL_CENTER = 8
+
+
+class SortedCenter(set):
+    """
+    The intervals of a large center: a set that also keeps them sorted
+    by begin and by end. Since every interval contains x_center, those
+    matching a query on one side of x_center are a prefix of by_begin
+    or a suffix of by_end, which bisection finds without scanning the
+    rest.
+
+    Change it only through add() and remove().
+    """
+    __slots__ = ('by_begin', 'by_end')
+
+    def __init__(self, intervals=()):
+        set.__init__(self, intervals)
+        self.by_begin = SortedListWithKey(self, key=attrgetter('begin'))
+        self.by_end = SortedListWithKey(self, key=attrgetter('end'))
+
+    def add(self, interval):
+        if interval not in self:
+            set.add(self, interval)
+            self.by_begin.add(interval)
+            self.by_end.add(interval)
+
+    def remove(self, interval):
+        set.remove(self, interval)
+        self.by_begin.remove(interval)
+        self.by_end.remove(interval)
+
+    def count_begin_before(self, bound, inclusive=False):
+        """
+        Returns how many intervals begin before bound, or at bound if
+        inclusive.
+        :rtype: int
+        """
+        if inclusive:
+            return self.by_begin.bisect_key_right(bound)
+        return self.by_begin.bisect_key_left(bound)
+
+    def count_end_after(self, bound):
+        """
+        Returns how many intervals end after bound.
+        :rtype: int
+        """
+        return len(self) - self.by_end.bisect_key_right(bound)
+
+    def copy(self):
+        """
+        Returns a copy that can be changed independently.
+        :rtype: SortedCenter
+        """
+        result = SortedCenter.__new__(SortedCenter)
+        set.__init__(result, self)
+        result.by_begin = self.by_begin.copy()
+        result.by_end = self.by_end.copy()
+        return result
+
+    def __reduce__(self):
+        return SortedCenter, (list(self),)
+
+
+def pack_center(intervals):
+    """
+    Returns distinct intervals as a tuple, or as a SortedCenter if there
+    are more than SMALL_CENTER of them.
+    :rtype: tuple or SortedCenter
+    """
+    intervals = tuple(intervals)
+    if len(intervals) > SMALL_CENTER:
+        return SortedCenter(intervals)
+    return intervals
+
+
 class Node(object):
+    """
+    A node of the tree. Trees that share nodes after
+    IntervalTree.copy() change a node in place only if its owner is
+    theirs, and change a copy of it otherwise; see owned(). Methods
+    that change a node are only called on nodes belonging to the
+    caller, so a node's owner is also the owner of the change.
+    """
+    __slots__ = ('x_center', '_center', 'left_node', 'right_node', 'depth', 'balance', 'owner')
+
     def __init__(self,
                  x_center=None,
-                 s_center=set(),
+                 s_center=(),
                  left_node=None,
-                 right_node=None):
+                 right_node=None,
+                 owner=None):
         self.x_center = x_center
-        self.s_center = set(s_center)
+        self.s_center = s_center
         self.left_node = left_node
         self.right_node = right_node
         self.depth = 0    # will be set when rotated
         self.balance = 0  # ditto
+        self.owner = owner
         self.rotate()
 
     @classmethod
-    def from_interval(cls, interval):
+    def from_interval(cls, interval, owner=None):
         """
         :rtype : Node
         """
         center = interval.begin
-        return Node(center, [interval])
+        return Node(center, [interval], owner=owner)
 
     @classmethod
-    def from_intervals(cls, intervals):
+    def from_intervals(cls, intervals, owner=None):
         """
         :rtype : Node
         """
         if not intervals:
             return None
-        node = Node()
-        node = node.init_from_sorted(sorted(intervals))
-        return node
+        return Node.from_sorted_intervals(sorted(intervals), owner)
 
-    def init_from_sorted(self, intervals):
+    @classmethod
+    def from_sorted_intervals(cls, intervals, owner=None):
+        """
+        Like from_intervals(), for a list of intervals already sorted
+        by begin. Builds a balanced tree directly, without recursion
+        or rotations.
+
+        The centers are chosen greedily: scanning by begin, an interval
+        starts a new group once it begins at or after the least end in
+        the current group, and each group's center is its greatest
+        begin, which all of the group's intervals contain. The interval
+        with the least end in a group contains no other center, so no
+        node is left empty.
+
+        Completes in O(n*log n) time, without sorting.
+        :rtype : Node
+        """
         if not intervals:
             return None
-        center_iv = intervals[len(intervals) // 2]
-        self.x_center = center_iv.begin
-        self.s_center = set()
-        s_left = []
-        s_right = []
-        for k in intervals:
-            if k.end <= self.x_center:
-                s_left.append(k)
-            elif k.begin > self.x_center:
-                s_right.append(k)
+        centers = []
+        starts = []  # index of the first interval in each group
+        least_end = None
+        for i, iv in enumerate(intervals):
+            if centers and iv.begin < least_end:
+                centers[-1] = iv.begin
+                if iv.end < least_end:
+                    least_end = iv.end
             else:
-                self.s_center.add(k)
-        self.left_node = Node.from_intervals(s_left)
-        self.right_node = Node.from_intervals(s_right)
-        return self.rotate()
+                centers.append(iv.begin)
+                starts.append(i)
+                least_end = iv.end
+        starts.append(len(intervals))
+
+        # balanced tree over the centers, splitting at the middle
+        nodes = []
+        node_at = [None] * len(centers)
+        stack = [(0, len(centers), None, 0)]  # (lo, hi, parent, branch)
+        while stack:
+            lo, hi, parent, branch = stack.pop()
+            mid = (lo + hi) // 2
+            node = node_at[mid] = Node(centers[mid], owner=owner)
+            node._center = []  # packed below
+            nodes.append(node)
+            if parent is not None:
+                parent[branch] = node
+            if lo < mid:
+                stack.append((lo, mid, node, 0))
+            if mid + 1 < hi:
+                stack.append((mid + 1, hi, node, 1))
+        # children come after their parents
+        for node in reversed(nodes):
+            node.refresh_balance()
+
+        # Every interval begins after the previous group's center. If it
+        # ends by the next group's center, it contains only its own.
+        top_node = nodes[0]
+        for g in range(len(centers)):
+            next_center = centers[g + 1] if g + 1 < len(centers) else None
+            for i in range(starts[g], starts[g + 1]):
+                iv = intervals[i]
+                if next_center is None or iv.end <= next_center:
+                    node_at[g]._center.append(iv)
+                    continue
+                node = top_node
+                while True:
+                    if iv.end <= node.x_center:
+                        node = node.left_node
+                    elif iv.begin > node.x_center:
+                        node = node.right_node
+                    else:
+                        break
+                node._center.append(iv)
+        for node in nodes:
+            node._center = pack_center(node._center)
+        return top_node
+
+    @property
+    def s_center(self):
+        """
+        The intervals containing x_center, as a frozenset. Internally,
+        small centers are kept in a tuple; see pack_center().
+        :rtype: frozenset of Interval
+        """
+        return frozenset(self._center)
+
+    @s_center.setter
+    def s_center(self, intervals):
+        self._center = pack_center(set(intervals))
+
+    def owned(self, owner):
+        """
+        Returns self if it belongs to owner. Otherwise, returns a copy
+        belonging to owner, which shares the children of self.
+        :rtype: Node
+        """
+        if self.owner is owner:
+            return self
+        node = Node.__new__(Node)
+        node.x_center = self.x_center
+        center = self._center
+        node._center = center.copy() if isinstance(center, SortedCenter) else center
+        node.left_node = self.left_node
+        node.right_node = self.right_node
+        node.depth = self.depth
+        node.balance = self.balance
+        node.owner = owner
+        return node
+
+    def owned_child(self, branch):
+        """
+        Returns the left (0) or right (1) child, first replacing it
+        with a copy if it does not belong to the owner of self.
+        :rtype: Node
+        """
+        child = self[branch]
+        if child is not None and child.owner is not self.owner:
+            child = self[branch] = child.owned(self.owner)
+        return child
+
+    def center_add(self, interval):
+        """
+        Adds interval to this node's center, if not already present.
+        """
+        center = self._center
+        if isinstance(center, set):
+            center.add(interval)
+        elif interval not in center:
+            self._center = pack_center(center + (interval,))
+
+    def center_remove(self, interval):
+        """
+        Removes interval from this node's center.
+        :raises KeyError: if interval is not present
+        """
+        center = self._center
+        if isinstance(center, set):
+            center.remove(interval)
+            return
+        try:
+            i = center.index(interval)
+        except ValueError:
+            raise KeyError(interval)
+        self._center = center[:i] + center[i + 1:]
+
+    def center_begin_before(self, bound, inclusive=False):
+        """
+        Returns the intervals in s_center that begin before bound, or
+        at bound if inclusive.
+        :rtype: collections.Iterable[Interval]
+        """
+        center = self._center
+        if isinstance(center, SortedCenter):
+            return center.by_begin.islice(0, center.count_begin_before(bound, inclusive))
+        if inclusive:
+            return [k for k in center if k.begin <= bound]
+        return [k for k in center if k.begin < bound]
+
+    def center_end_after(self, bound):
+        """
+        Returns the intervals in s_center that end after bound.
+        :rtype: collections.Iterable[Interval]
+        """
+        center = self._center
+        if isinstance(center, SortedCenter):
+            return center.by_end.islice(len(center) - center.count_end_after(bound))
+        return [k for k in center if k.end > bound]
+
+    def center_count_begin_before(self, bound, inclusive=False):
+        """
+        Returns how many intervals in s_center begin before bound, or
+        at bound if inclusive.
+        :rtype: int
+        """
+        center = self._center
+        if isinstance(center, SortedCenter):
+            return center.count_begin_before(bound, inclusive)
+        return len(self.center_begin_before(bound, inclusive))
+
+    def center_count_end_after(self, bound):
+        """
+        Returns how many intervals in s_center end after bound.
+        :rtype: int
+        """
+        center = self._center
+        if isinstance(center, SortedCenter):
+            return center.count_end_after(bound)
+        return len(self.center_end_after(bound))
 
     def center_hit(self, interval):
         """Returns whether interval overlaps self.x_center."""
@@ -151,7 +415,7 @@ class Node(object):
         #assert(self.balance != 0)
         heavy = self.balance > 0
         light = not heavy
-        save = self[heavy]
+        save = self.owned_child(heavy)
         #print("srotate: bal={},{}".format(self.balance, save.balance))
         #self.print_structure()
         self[heavy] = save[light]   # 2
@@ -160,21 +424,22 @@ class Node(object):
 
         # Some intervals may overlap both self.x_center and save.x_center
         # Promote those to the new tip of the tree
-        promotees = [iv for iv in save[light].s_center if save.center_hit(iv)]
+        promotees = [iv for iv in save[light]._center if save.center_hit(iv)]
         if promotees:
             for iv in promotees:
-                save[light] = save[light].remove(iv)  # may trigger pruning
+                save[light] = save.owned_child(light).remove(iv)  # may trigger pruning
             # TODO: Use Node.add() here, to simplify future balancing improvements.
-            # For now, this is the same as augmenting save.s_center, but that may
+            # For now, this is the same as augmenting save._center, but that may
             # change.
-            save.s_center.update(promotees)
+            for iv in promotees:
+                save.center_add(iv)
         save.refresh_balance()
         return save
 
     def drotate(self):
         # First rotation
         my_heavy = self.balance > 0
-        self[my_heavy] = self[my_heavy].srotate()
+        self[my_heavy] = self.owned_child(my_heavy).srotate()
         self.refresh_balance()
 
         # Second rotation
@@ -187,16 +452,16 @@ class Node(object):
         Returns self after adding the interval and balancing.
         """
         if self.center_hit(interval):
-            self.s_center.add(interval)
+            self.center_add(interval)
             return self
         else:
             direction = self.hit_branch(interval)
             if not self[direction]:
-                self[direction] = Node.from_interval(interval)
+                self[direction] = Node.from_interval(interval, self.owner)
                 self.refresh_balance()
                 return self
             else:
-                self[direction] = self[direction].add(interval)
+                self[direction] = self.owned_child(direction).add(interval)
                 return self.rotate()
 
     def remove(self, interval):
@@ -235,23 +500,23 @@ class Node(object):
         #   self.x_center, interval))
         if self.center_hit(interval):
             #if trace: print('Hit at {}'.format(self.x_center))
-            if not should_raise_error and interval not in self.s_center:
+            if not should_raise_error and interval not in self._center:
                 done.append(1)
                 #if trace: print('Doing nothing.')
                 return self
             try:
                 # raises error if interval not present - this is
                 # desired.
-                self.s_center.remove(interval)
+                self.center_remove(interval)
             except:
                 self.print_structure()
                 raise KeyError(interval)
-            if self.s_center:     # keep this node
+            if self._center:     # keep this node
                 done.append(1)    # no rebalancing necessary
                 #if trace: print('Removed, no rebalancing.')
                 return self
 
-            # If we reach here, no intervals are left in self.s_center.
+            # If we reach here, no intervals are left in self._center.
             # So, prune self.
             return self.prune()
         else:  # interval not in s_center
@@ -267,7 +532,9 @@ class Node(object):
             #   print('Descending to {} branch'.format(
             #       ['left', 'right'][direction]
             #       ))
-            self[direction] = self[direction].remove_interval_helper(interval, done, should_raise_error)
+            self[direction] = self.owned_child(direction).remove_interval_helper(
+                interval, done, should_raise_error
+            )
 
             # Clean up
             if not done:
@@ -277,6 +544,54 @@ class Node(object):
                 return self.rotate()
             return self
 
+    def remove_many(self, intervals):
+        """
+        Returns self after removing a set of intervals, all present,
+        and balancing. Visits only the subtrees holding them, removes
+        them from each center at once, and fixes the balance once per
+        node on the way up, instead of descending for each interval.
+        """
+        ordered = sorted(intervals, key=attrgetter('begin'))
+        begins = [iv.begin for iv in ordered]
+        return self.remove_many_helper(ordered, begins, None, None)
+
+    def remove_many_helper(self, ordered, begins, lo, hi):
+        """
+        Returns self after removing the intervals in ordered, which is
+        sorted by begin, that are in this subtree. Every interval of
+        this subtree begins after lo and before hi, the x_centers of
+        its nearest ancestors, where None is unbounded.
+        """
+        x = self.x_center
+        # removed intervals beginning in (lo, x] are in this center if
+        # they contain x but not hi, in the left subtree if they contain
+        # neither, and in an ancestor otherwise
+        first = bisect_right(begins, lo) if lo is not None else 0
+        middle = bisect_right(begins, x, first)
+        last = bisect_left(begins, hi, middle) if hi is not None else len(begins)
+        center = self._center
+        if middle - first < len(center):
+            for i in xrange(first, middle):
+                iv = ordered[i]
+                if iv.end > x and (hi is None or iv.end <= hi):
+                    self.center_remove(iv)
+        elif first < middle:
+            removed = set(ordered[first:middle])
+            self._center = pack_center(iv for iv in center if iv not in removed)
+        if first < middle and self[0]:
+            self[0] = self.owned_child(0).remove_many_helper(ordered, begins, lo, x)
+        if middle < last and self[1]:
+            self[1] = self.owned_child(1).remove_many_helper(ordered, begins, x, hi)
+
+        self.refresh_balance()
+        if not self._center:
+            if not self[0] or not self[1] or abs(self.balance) < 2:
+                return self.prune()
+        elif abs(self.balance) <= 2:
+            return self.rotate()
+        # too unbalanced for rotations; rebuild this subtree
+        return Node.from_intervals(self.all_children(), self.owner)
+
     def search_overlap(self, point_list):
         """
         Returns all intervals that overlap the point_list.
@@ -286,17 +601,343 @@ class Node(object):
             self.search_point(j, result)
         return result
 
+    def search_range(self, begin, end, result):
+        """
+        Returns all intervals that overlap the range [begin, end).
+
+        Every interval in a left subtree ends at or before this
+        x_center, and every interval in a right subtree begins after
+        it, so each subtree is entered only if it can hold a match.
+        Assumes begin < end.
+        """
+        x_center = self.x_center
+        if x_center < begin:
+            # left subtree ends before begin; s_center hits must end
+            # after begin
+            result.update(self.center_end_after(begin))
+        elif x_center >= end:
+            # right subtree begins after end; s_center hits must begin
+            # before end
+            result.update(self.center_begin_before(end))
+        else:
+            # x_center is inside the range, so all of s_center overlaps
+            result.update(self._center)
+        if begin < x_center and self[0]:
+            self[0].search_range(begin, end, result)
+        if end > x_center and self[1]:
+            self[1].search_range(begin, end, result)
+        return result
+
+    def search_envelop(self, begin, end, result):
+        """
+        Returns all intervals enveloped by the range [begin, end].
+
+        Intervals in s_center contain x_center, so none can be
+        enveloped unless begin <= x_center < end. If x_center is left
+        of the range, the left subtree is skipped; if it is right of
+        the range, the right subtree is skipped. Assumes begin < end.
+        """
+        x_center = self.x_center
+        if x_center < begin:
+            if self[1]:
+                self[1].search_envelop(begin, end, result)
+        elif x_center >= end:
+            if self[0]:
+                self[0].search_envelop(begin, end, result)
+        else:
+            for k in self._center:
+                if begin <= k.begin and k.end <= end:
+                    result.add(k)
+            if self[0]:
+                self[0].search_envelop(begin, end, result)
+            if self[1]:
+                self[1].search_envelop(begin, end, result)
+        return result
+
+    def iter_point(self, point):
+        """
+        Lazily yields all intervals that contain point.
+        """
+        node = self
+        while node:
+            if point < node.x_center:
+                for k in node.center_begin_before(point, inclusive=True):
+                    yield k
+                node = node[0]
+            elif point > node.x_center:
+                for k in node.center_end_after(point):
+                    yield k
+                node = node[1]
+            else:
+                for k in node._center:
+                    yield k
+                break
+
+    def iter_range(self, begin, end):
+        """
+        Lazily yields all intervals that overlap the range [begin, end).
+        Visits the same nodes as search_range(). Assumes begin < end.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            x_center = node.x_center
+            if x_center < begin:
+                for k in node.center_end_after(begin):
+                    yield k
+            elif x_center >= end:
+                for k in node.center_begin_before(end):
+                    yield k
+            else:
+                for k in node._center:
+                    yield k
+            if end > x_center and node[1]:
+                stack.append(node[1])
+            if begin < x_center and node[0]:
+                stack.append(node[0])
+
+    def iter_envelop(self, begin, end):
+        """
+        Lazily yields all intervals enveloped by the range [begin, end].
+        Visits the same nodes as search_envelop(). Assumes begin < end.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            x_center = node.x_center
+            if x_center < begin:
+                if node[1]:
+                    stack.append(node[1])
+            elif x_center >= end:
+                if node[0]:
+                    stack.append(node[0])
+            else:
+                for k in node._center:
+                    if begin <= k.begin and k.end <= end:
+                        yield k
+                if node[1]:
+                    stack.append(node[1])
+                if node[0]:
+                    stack.append(node[0])
+
+    def iter_nearest(self, begin, end):
+        """
+        Lazily yields (distance, interval) pairs for all intervals in
+        the subtree, nearest to the range [begin, end] first. Pass
+        begin == end for a point. Intervals that overlap or touch the
+        range have distance 0.
+
+        This is a best-first search: each subtree is queued with a
+        lower bound on the distance of its intervals, and is only
+        expanded once nothing closer remains. Intervals in a left
+        subtree end at or before x_center, and intervals in a right
+        subtree begin after it, which gives the bounds. A SortedCenter
+        is queued one interval at a time, nearest first: by descending
+        end if the range is right of x_center, and by ascending begin
+        otherwise.
+
+        Distances are differences of bounds, so they are timedeltas
+        for datetime bounds.
+        """
+        zero = end - end
+
+        def gap(k):
+            if k.end < begin:
+                return begin - k.end
+            if k.begin > end:
+                return k.begin - end
+            return zero
+
+        # entries are (distance, tie-breaker, node, interval, cursor);
+        # the tie-breaker keeps nodes and intervals from being compared
+        heap = [(zero, 0, self, None, None)]
+        count = 1
+        while heap:
+            distance, _, node, interval, cursor = heappop(heap)
+            if node is None:
+                yield distance, interval
+                if cursor is not None:
+                    # queue the next interval of the same center
+                    ordered, i, step = cursor
+                    i += step
+                    if 0 <= i < len(ordered):
+                        k = ordered[i]
+                        heappush(heap, (gap(k), count, None, k, (ordered, i, step)))
+                        count += 1
+                continue
+            x_center = node.x_center
+            center = node._center
+            if isinstance(center, SortedCenter):
+                if x_center < begin:
+                    cursor = (center.by_end, len(center) - 1, -1)
+                else:
+                    cursor = (center.by_begin, 0, 1)
+                k = cursor[0][cursor[1]]
+                heappush(heap, (gap(k), count, None, k, cursor))
+                count += 1
+            else:
+                for k in center:
+                    heappush(heap, (gap(k), count, None, k, None))
+                    count += 1
+            if node[0]:
+                bound = max(distance, begin - x_center)
+                heappush(heap, (bound, count, node[0], None, None))
+                count += 1
+            if node[1]:
+                bound = max(distance, x_center - end)
+                heappush(heap, (bound, count, node[1], None, None))
+                count += 1
+
+    def count_point(self, point):
+        """
+        Returns the number of intervals that contain point, without
+        collecting them.
+        """
+        count = 0
+        node = self
+        while node:
+            x_center = node.x_center
+            # every interval in s_center contains x_center, so only the
+            # bound on the far side of point needs checking
+            if point < x_center:
+                count += node.center_count_begin_before(point, inclusive=True)
+                node = node[0]
+            elif point > x_center:
+                count += node.center_count_end_after(point)
+                node = node[1]
+            else:
+                count += len(node._center)
+                break
+        return count
+
+    def count_range(self, begin, end):
+        """
+        Returns the number of intervals that overlap the range
+        [begin, end), without collecting them. Assumes begin < end.
+        """
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            x_center = node.x_center
+            if x_center < begin:
+                count += node.center_count_end_after(begin)
+            elif x_center >= end:
+                count += node.center_count_begin_before(end)
+            else:
+                count += len(node._center)
+            if begin < x_center and node[0]:
+                stack.append(node[0])
+            if end > x_center and node[1]:
+                stack.append(node[1])
+        return count
+
+    def search_points(self, points, lo, hi, results):
+        """
+        Batch version of search_point(). For each index i in [lo, hi),
+        adds the intervals that contain points[i] to results[i].
+
+        points must be sorted, so the points contained by an interval
+        form a contiguous run that can be found by bisection, and each
+        node is visited once for the whole batch.
+        """
+        x_center = self.x_center
+        center = self._center
+        left = bisect_left(points, x_center, lo, hi)
+        right = bisect_right(points, x_center, left, hi)
+        if isinstance(center, SortedCenter):
+            # Points left of x_center are contained by a prefix of
+            # by_begin, and points right of it by a suffix of by_end,
+            # so stop at the first interval containing none of them.
+            for k in center.by_begin:
+                first = bisect_left(points, k.begin, lo, left)
+                if first == left:
+                    break
+                for i in xrange(first, left):
+                    results[i].add(k)
+            for k in reversed(center.by_end):
+                last = bisect_left(points, k.end, right, hi)
+                if last == right:
+                    break
+                for i in xrange(right, last):
+                    results[i].add(k)
+            for i in xrange(left, right):
+                results[i].update(center)
+        else:
+            for k in center:
+                first = bisect_left(points, k.begin, lo, hi)
+                last = bisect_left(points, k.end, first, hi)
+                for i in xrange(first, last):
+                    results[i].add(k)
+        if self[0] and lo < left:
+            self[0].search_points(points, lo, left, results)
+        if self[1] and right < hi:
+            self[1].search_points(points, right, hi, results)
+        return results
+
+    def search_ranges(self, windows, results, strict=False):
+        """
+        Batch version of search_range() and search_envelop().
+
+        windows is a sorted list of (begin, end, index) tuples with
+        begin < end. Adds the intervals overlapping (or, if strict,
+        enveloped by) each window to results[index]. Each node is
+        visited once for the whole batch, and only the windows that
+        can have matches in a subtree are passed down to it.
+        """
+        x_center = self.x_center
+        s_center = self._center
+        # Windows in lower begin left of x_center. Windows in upper
+        # begin at or after it, so they all end right of it.
+        split = bisect_left(windows, (x_center,))
+        lower = windows[:split]
+        upper = windows[split:]
+        right = []
+        for window in lower:
+            begin, end, index = window
+            if end > x_center:
+                right.append(window)
+                if strict:
+                    results[index].update(
+                        k for k in s_center if begin <= k.begin and k.end <= end
+                    )
+                else:
+                    results[index].update(s_center)
+            elif not strict:
+                results[index].update(self.center_begin_before(end))
+        right.extend(upper)
+        for begin, end, index in upper:
+            if begin == x_center:
+                if strict:
+                    results[index].update(
+                        k for k in s_center if begin <= k.begin and k.end <= end
+                    )
+                else:
+                    results[index].update(s_center)
+            elif strict:
+                break  # s_center can't be enveloped by the rest
+            else:
+                results[index].update(self.center_end_after(begin))
+        if lower and self[0]:
+            self[0].search_ranges(lower, results, strict)
+        if right and self[1]:
+            self[1].search_ranges(right, results, strict)
+        return results
+
     def search_point(self, point, result):
         """
         Returns all intervals that contain point.
         """
-        for k in self.s_center:
-            if k.begin <= point < k.end:
-                result.add(k)
-        if point < self.x_center and self[0]:
-            return self[0].search_point(point, result)
-        elif point > self.x_center and self[1]:
-            return self[1].search_point(point, result)
+        if point < self.x_center:
+            result.update(self.center_begin_before(point, inclusive=True))
+            if self[0]:
+                return self[0].search_point(point, result)
+        elif point > self.x_center:
+            result.update(self.center_end_after(point))
+            if self[1]:
+                return self[1].search_point(point, result)
+        else:
+            result.update(self._center)
         return result
 
     def prune(self):
@@ -315,7 +956,7 @@ class Node(object):
             return result
         else:
             # Replace the root node with the greatest predecessor.
-            heir, self[0] = self[0].pop_greatest_child()
+            heir, self[0] = self.owned_child(0).pop_greatest_child()
             #if trace:
             #    print('Replacing {} with {}.'.format(
             #        self.x_center, heir.x_center
@@ -350,7 +991,7 @@ class Node(object):
               - balancing
               - moving overlapping nodes into greatest_child
 
-        Assumes that self.s_center is not empty.
+        Assumes that self._center is not empty.
 
         See Eternally Confuzzled's jsw_remove_r function (lines 34-54)
         in his AVL tree article for reference.
@@ -360,7 +1001,7 @@ class Node(object):
             # To reduce the chances of an overlap with a parent, return
             # a child node containing the smallest possible number of
             # intervals, as close as possible to the maximum bound.
-            ivs = sorted(self.s_center, key=attrgetter('end', 'begin'))
+            ivs = sorted(self._center, key=attrgetter('end', 'begin'))
             max_iv = ivs.pop()
             new_x_center = self.x_center
             while ivs:
@@ -368,15 +1009,17 @@ class Node(object):
                 if next_max_iv.end == max_iv.end: continue
                 new_x_center = max(new_x_center, next_max_iv.end)
             def get_new_s_center():
-                for iv in self.s_center:
+                for iv in self._center:
                     if iv.contains_point(new_x_center): yield iv
 
             # Create a new node with the largest x_center possible.
             child = Node.from_intervals(get_new_s_center())
-            #     [iv for iv in self.s_center if iv.contains_point(child_x_center)]
+            #     [iv for iv in self._center if iv.contains_point(child_x_center)]
             # )
             child.x_center = new_x_center
-            self.s_center -= child.s_center
+            child.owner = self.owner
+            moved = set(child._center)
+            self._center = pack_center(iv for iv in self._center if iv not in moved)
 
             #print('Pop hit! Returning child   = {}'.format(
             #    child.print_structure(tostring=True)
@@ -384,7 +1027,7 @@ class Node(object):
             #assert not child[0]
             #assert not child[1]
 
-            if self.s_center:
+            if self._center:
                 #print('     and returning newnode = {}'.format( self ))
                 #self.verify()
                 return child, self
@@ -395,27 +1038,28 @@ class Node(object):
 
         else:
             #print('Pop descent to {}'.format(self[1].x_center))
-            (greatest_child, self[1]) = self[1].pop_greatest_child()
-            self.refresh_balance()
-            new_self = self.rotate()
+            (greatest_child, self[1]) = self.owned_child(1).pop_greatest_child()
 
-            # Move any overlaps into greatest_child
-            for iv in set(new_self.s_center):
+            # Move any overlaps into greatest_child. This must happen
+            # before rotating, which may move this node below another.
+            for iv in tuple(self._center):
                 if iv.contains_point(greatest_child.x_center):
-                    new_self.s_center.remove(iv)
+                    self.center_remove(iv)
                     greatest_child.add(iv)
 
             #print('Pop Returning child   = {}'.format(
             #    greatest_child.print_structure(tostring=True)
             #    ))
-            if new_self.s_center:
+            if self._center:
+                self.refresh_balance()
+                new_self = self.rotate()
                 #print('and returning newnode = {}'.format(
                 #    new_self.print_structure(tostring=True)
                 #    ))
                 #new_self.verify()
                 return greatest_child, new_self
             else:
-                new_self = new_self.prune()
+                new_self = self.prune()
                 #print('and returning prune = {}'.format(
                 #    new_self.print_structure(tostring=True)
                 #    ))
@@ -426,9 +1070,22 @@ class Node(object):
         """
         Returns whether this node or a child overlaps p.
         """
-        for iv in self.s_center:
-            if iv.contains_point(p):
+        center = self._center
+        if isinstance(center, SortedCenter):
+            # as in search_point(), only one end of each interval can
+            # miss p, so count those that reach it
+            if p < self.x_center:
+                if center.count_begin_before(p, inclusive=True):
+                    return True
+            elif p > self.x_center:
+                if center.count_end_after(p):
+                    return True
+            else:
                 return True
+        else:
+            for iv in center:
+                if iv.contains_point(p):
+                    return True
         branch = self[p > self.x_center]
         return branch and branch.contains_point(p)
 
@@ -436,7 +1093,7 @@ class Node(object):
         return self.all_children_helper(set())
 
     def all_children_helper(self, result):
-        result.update(self.s_center)
+        result.update(self._center)
         if self[0]:
             self[0].all_children_helper(result)
         if self[1]:
@@ -449,7 +1106,15 @@ class Node(object):
         Recursively ensures that the invariants of an interval subtree
         hold.
         """
-        assert(isinstance(self.s_center, set))
+        center = self._center
+        if isinstance(center, SortedCenter):
+            assert set(center.by_begin) == set(center.by_end) == center
+            assert len(center.by_begin) == len(center.by_end) == len(center)
+            assert [k.begin for k in center.by_begin] == sorted(k.begin for k in center)
+            assert [k.end for k in center.by_end] == sorted(k.end for k in center)
+        else:
+            assert isinstance(center, tuple)
+            assert len(set(center)) == len(center) <= SMALL_CENTER
 
         bal = self.balance
         assert abs(bal) < 2, \
@@ -462,11 +1127,11 @@ class Node(object):
                 self.print_structure(tostring=True)
             )
 
-        assert self.s_center, \
+        assert self._center, \
             "Error: s_center is empty! \n{}".format(
                 self.print_structure(tostring=True)
             )
-        for iv in self.s_center:
+        for iv in self._center:
             assert hasattr(iv, 'begin')
             assert hasattr(iv, 'end')
             assert iv.begin < iv.end
@@ -516,7 +1181,7 @@ class Node(object):
             self.balance
         )
         #fieldcount = 'c_count,has_l,has_r = <{}, {}, {}>'.format(
-        #    len(self.s_center),
+        #    len(self._center),
         #    bool(self.left_node),
         #    bool(self.right_node)
         #)
@@ -560,7 +1225,7 @@ class Node(object):
         # di is how may levels deeper than optimal d is
         di = d - dopt
         if di > 0:
-            count = di * len(self.s_center)
+            count = di * len(self._center)
         else:
             count = 0
         if self.right_node:
@@ -577,8 +1242,8 @@ class Node(object):
         sp = indent * '    '
 
         rlist = [str(self) + nl]
-        if self.s_center:
-            for iv in sorted(self.s_center):
+        if self._center:
+            for iv in sorted(self._center):
                 rlist.append(sp + ' ' + repr(iv) + nl)
         if self.left_node:
             rlist.append(sp + '<:  ')  # no CR
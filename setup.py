@@ -235,6 +235,7 @@ setup(
     name='intervaltree',
     version=version,
     install_requires=['sortedcontainers'],
+    extras_require={'numpy': ['numpy']},
     description='Editable interval tree data structure for Python 2 and 3',
     long_description=get_rst(),
     classifiers=[  # Get strings from http://pypi.python.org/pypi?%3Aaction=list_classifiers
@@ -0,0 +1,495 @@
+"""
+intervaltree: A mutable, self-balancing interval tree for Python 2 and 3.
+Queries may be by point, by range overlap, or by range envelopment.
+
+Test module: benchmarks
+
+These are not run by the test suite. To run them all, or only the
+named ones:
+
+    python -m test.benchmarks [name ...]
+
+Copyright 2013-2015 Chaim-Leib Halbert
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import absolute_import, print_function
+from intervaltree import Interval, IntervalTree, FrozenIntervalTree
+from random import Random
+from time import time
+import gc
+import sys
+try:
+    xrange
+except NameError:
+    xrange = range
+
+
+def random_intervals(size, span=10**6, max_length=200, seed=0):
+    """
+    Create a list of Intervals with random begins in [0, span) and
+    random lengths in [1, max_length].
+    :rtype: list of Interval
+    """
+    rand = Random(seed)
+    result = []
+    for i in xrange(size):
+        begin = rand.randint(0, span - 1)
+        result.append(Interval(begin, begin + rand.randint(1, max_length)))
+    return result
+
+
+def random_ranges(size, span=10**6, max_length=200, seed=1):
+    """
+    Create a list of (begin, end) tuples, as random_intervals().
+    :rtype: list of tuple
+    """
+    return [(iv.begin, iv.end) for iv in random_intervals(size, span, max_length, seed)]
+
+
+def timed(func, *args, **kwargs):
+    """
+    Calls func and returns (seconds elapsed, return value). Like
+    timeit, turns off garbage collection while func runs.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time()
+        result = func(*args, **kwargs)
+        return time() - start, result
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def report(title, baseline, candidate):
+    """
+    Prints the timings of a baseline and a candidate implementation.
+    """
+    print("{0}: baseline {1:.3f}s, candidate {2:.3f}s, speedup {3:.1f}x".format(
+        title, baseline, candidate, baseline / max(candidate, 1e-9)
+    ))
+
+
+def bench_search_many(size=10**5, points=10**6):
+    """
+    search_many() against a loop of point queries.
+    """
+    tree = IntervalTree(random_intervals(size))
+    pts = [begin for begin, end in random_ranges(points)]
+
+    baseline, expected = timed(lambda: [tree[p] for p in pts])
+    candidate, result = timed(tree.search_many, pts)
+    assert result == expected
+    report("search_many, n={0}, points={1}".format(size, points), baseline, candidate)
+
+
+def bench_search_ranges(size=10**5, ranges=5 * 10**4):
+    """
+    search_ranges() against a loop of range queries, for short and
+    wide windows.
+    """
+    tree = IntervalTree(random_intervals(size))
+    for max_length in (100, 5000):
+        windows = random_ranges(ranges, max_length=max_length)
+        for strict in (False, True):
+            baseline, expected = timed(
+                lambda: [tree.search(begin, end, strict) for begin, end in windows]
+            )
+            candidate, result = timed(tree.search_ranges, windows, strict)
+            assert result == expected
+            report(
+                "search_ranges, n={0}, ranges={1}, max_length={2}, strict={3}".format(
+                    size, ranges, max_length, strict
+                ),
+                baseline,
+                candidate
+            )
+
+
+def bench_search_points_array(size=10**5, points=10**6):
+    """
+    search_points_array() against search_many(). Requires NumPy.
+    """
+    try:
+        import numpy
+    except ImportError:
+        print("search_points_array: skipped, NumPy is not installed")
+        return
+    tree = IntervalTree(random_intervals(size))
+    pts = [begin for begin, end in random_ranges(points)]
+    array = numpy.array(pts)
+
+    baseline, expected = timed(tree.search_many, pts)
+    candidate, (offsets, indices) = timed(tree.search_points_array, array)
+    assert offsets[-1] == sum(len(hits) for hits in expected)
+    report("search_points_array, n={0}, points={1}".format(size, points), baseline, candidate)
+
+
+def bench_from_sorted(size=10**5):
+    """
+    IntervalTree.from_sorted() against IntervalTree().
+    """
+    ivs = sorted(random_intervals(size))
+
+    baseline, expected = timed(IntervalTree, ivs)
+    candidate, result = timed(IntervalTree.from_sorted, ivs)
+    assert result == expected
+    report("from_sorted, n={0}".format(size), baseline, candidate)
+    candidate, result = timed(IntervalTree.from_sorted, ivs, assume_unique=True)
+    assert result == expected
+    report("from_sorted, assume_unique, n={0}".format(size), baseline, candidate)
+
+
+def bench_construction(sizes=(10**5, 10**6, 10**7)):
+    """
+    Building a tree from unsorted and from sorted intervals.
+    """
+    for size in sizes:
+        ivs = random_intervals(size)
+        elapsed, tree = timed(IntervalTree, ivs)
+        print("construction, n={0}: IntervalTree() {1:.3f}s".format(size, elapsed))
+        del tree
+        ivs.sort()
+        elapsed, tree = timed(IntervalTree.from_sorted, ivs, assume_unique=True)
+        print("construction, n={0}: from_sorted() {1:.3f}s".format(size, elapsed))
+        del tree
+
+
+def bench_update(size=10**5, ratios=(0.01, 0.1, 0.3, 0.5, 0.7, 1.0)):
+    """
+    update() adding one interval at a time, against merging and
+    rebuilding, for batches of different sizes relative to the tree.
+    Shows where IntervalTree.bulk_update_ratio should sit.
+    """
+    ivs = random_intervals(size)
+    for ratio in ratios:
+        batch = random_intervals(int(size * ratio), seed=3)
+
+        def run(bulk_update_ratio):
+            tree = IntervalTree(ivs)
+            tree.bulk_update_ratio = bulk_update_ratio
+            return timed(tree.update, batch)[0], tree
+
+        baseline, expected = run(None)
+        candidate, result = run(0)
+        assert result == expected
+        report("update, n={0}, batch={1}".format(size, len(batch)), baseline, candidate)
+
+
+def bench_small_edits(size=3 * 10**5, edits=200):
+    """
+    Many single-interval update() and narrow chop() calls on a large
+    tree. Each should cost O(log n), not O(n).
+    """
+    tree = IntervalTree(random_intervals(size))
+    batch = random_intervals(edits, seed=9)
+    elapsed, result = timed(lambda: [tree.update([iv]) for iv in batch])
+    print("small edits, n={0}: {1} update() calls {2:.3f}s".format(size, edits, elapsed))
+    elapsed, result = timed(lambda: [tree.chop(iv.begin, iv.begin + 1) for iv in batch])
+    print("small edits, n={0}: {1} chop() calls {2:.3f}s".format(size, edits, elapsed))
+
+
+def bench_remove(size=10**5, ratios=(0.01, 0.1, 0.2, 0.3, 0.5)):
+    """
+    remove_overlap() removing intervals in one pass over the nodes, against
+    rebuilding from the rest, for ranges holding different fractions
+    of the tree. Shows where IntervalTree.bulk_removal_ratio should sit.
+    """
+    ivs = random_intervals(size)
+    for ratio in ratios:
+        begin, end = 0, int(10**6 * ratio)
+
+        def run(bulk_removal_ratio):
+            tree = IntervalTree(ivs)
+            tree.bulk_removal_ratio = bulk_removal_ratio
+            return timed(tree.remove_overlap, begin, end)[0], tree
+
+        baseline, expected = run(None)
+        candidate, result = run(0)
+        assert result == expected
+        report("remove_overlap, n={0}, removed={1}".format(
+            size, size - len(result)
+        ), baseline, candidate)
+
+
+def bench_fat_nodes(size=10**4, queries=10**4):
+    """
+    Point and range queries on a tree where most intervals share a few
+    nodes: long, overlapping sessions.
+    """
+    rand = Random(2)
+    ivs = []
+    for i in xrange(size):
+        begin = rand.randint(0, 10**5)
+        ivs.append(Interval(begin, begin + rand.randint(10**5, 10**6)))
+    tree = IntervalTree(ivs)
+    pts = [rand.randint(0, 11 * 10**5) for i in xrange(queries)]
+
+    elapsed, result = timed(lambda: [tree.count_overlap(p) for p in pts])
+    print("fat nodes, n={0}: {1} count_overlap(point) {2:.3f}s".format(size, queries, elapsed))
+    elapsed, result = timed(lambda: [tree.count_overlap(p, p + 10) for p in pts])
+    print("fat nodes, n={0}: {1} count_overlap(begin, end) {2:.3f}s".format(size, queries, elapsed))
+    elapsed, result = timed(lambda: [tree[p] for p in pts])
+    print("fat nodes, n={0}: {1} point queries {2:.3f}s".format(size, queries, elapsed))
+
+
+def bench_slice_many(size=10**4, days=1000):
+    """
+    slice_many() against a loop of slice(): splitting a calendar of
+    multi-day events at every midnight.
+    """
+    day = 1440
+    rand = Random(4)
+    ivs = []
+    for i in xrange(size):
+        begin = rand.randint(0, days * day)
+        ivs.append(Interval(begin, begin + rand.randint(60, 7 * day)))
+    midnights = [i * day for i in xrange(days + 8)]
+
+    def run_slice():
+        tree = IntervalTree(ivs)
+        for point in midnights:
+            tree.slice(point)
+        return tree
+
+    def run_slice_many():
+        tree = IntervalTree(ivs)
+        tree.slice_many(midnights)
+        return tree
+
+    baseline, expected = timed(run_slice)
+    candidate, result = timed(run_slice_many)
+    assert result == expected
+    report("slice_many, n={0}, points={1}".format(size, len(midnights)), baseline, candidate)
+
+
+def bench_find_nested(sizes=(10**4, 2 * 10**5)):
+    """
+    find_nested() on random intervals.
+    """
+    for size in sizes:
+        tree = IntervalTree(random_intervals(size, max_length=2000))
+        elapsed, result = timed(tree.find_nested)
+        print("find_nested, n={0}: {1} pairs in {2:.3f}s".format(
+            size, sum(len(children) for children in result.values()), elapsed
+        ))
+
+
+def bench_split_overlaps(sizes=(10**3, 10**4)):
+    """
+    split_overlaps() on overlapping, gapless intervals, with and
+    without a long interval covering all of them.
+    """
+    from test.intervals import overlaps_nogaps_rand
+    import random
+    for size in sizes:
+        random.seed(size)
+        ivs = overlaps_nogaps_rand(size, labels=True)
+        for covered in (False, True):
+            tree = IntervalTree(ivs)
+            if covered:
+                tree.addi(tree.begin(), tree.end(), 'cover')
+            elapsed, result = timed(tree.split_overlaps)
+            print("split_overlaps, n={0}, covered={1}: {2} pieces in {3:.3f}s".format(
+                size, covered, len(tree), elapsed
+            ))
+
+
+def bench_set_algebra(size=10**5):
+    """
+    Set operations between two trees, against building a new tree
+    from the equivalent Python set operation.
+    """
+    left = IntervalTree(random_intervals(size))
+    right = IntervalTree(random_intervals(size // 2) + random_intervals(size // 2, seed=6))
+    for name in ('union', 'intersection', 'difference', 'symmetric_difference'):
+        set_op = getattr(set, name)
+        baseline, expected = timed(lambda: IntervalTree(set_op(set(left), set(right))))
+        candidate, result = timed(getattr(left, name), right)
+        assert result == expected
+        report("{0}, n={1}".format(name, size), baseline, candidate)
+
+    def discard_all(tree, other):
+        for iv in other:
+            tree.discard(iv)
+        return tree
+
+    expected = IntervalTree(left)
+    baseline, expected = timed(discard_all, expected, right)
+    result = IntervalTree(left)
+    candidate = timed(result.difference_update, right)[0]
+    assert result == expected
+    report("difference_update, n={0}".format(size), baseline, candidate)
+
+
+def traced_memory(func):
+    """
+    Calls func and returns (bytes allocated and kept, return value), or
+    (None, return value) where tracemalloc is unavailable.
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return None, func()
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+
+def peak_memory(func):
+    """
+    Calls func and returns (peak bytes allocated while it ran, return
+    value), or (None, return value) where tracemalloc is unavailable.
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return None, func()
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+def bench_frozen(size=10**5, queries=10**5):
+    """
+    FrozenIntervalTree against IntervalTree: memory, point and range
+    queries.
+    """
+    ivs = random_intervals(size)
+    begins = [iv.begin for iv in ivs]
+    ends = [iv.end for iv in ivs]
+    tree_memory, tree = traced_memory(
+        lambda: IntervalTree(Interval(begin, end) for begin, end in zip(begins, ends))
+    )
+    frozen_memory, frozen = traced_memory(lambda: FrozenIntervalTree(tree))
+    columnar_memory, columnar = traced_memory(
+        lambda: FrozenIntervalTree.from_columns(begins, ends)
+    )
+    if tree_memory is not None:
+        print(
+            "frozen, n={0}: IntervalTree {1:.1f}MB, FrozenIntervalTree {2:.1f}MB more,"
+            " columnar FrozenIntervalTree {3:.1f}MB".format(
+                size, tree_memory / 2.0**20, frozen_memory / 2.0**20,
+                columnar_memory / 2.0**20
+            )
+        )
+
+    pts = [begin for begin, end in random_ranges(queries)]
+    baseline, expected = timed(lambda: [tree[p] for p in pts])
+    candidate, result = timed(lambda: [frozen[p] for p in pts])
+    assert result == expected
+    report("frozen point queries, n={0}, queries={1}".format(size, queries), baseline, candidate)
+
+    windows = random_ranges(queries, max_length=1000)
+    baseline, expected = timed(lambda: [tree[begin:end] for begin, end in windows])
+    candidate, result = timed(lambda: [frozen[begin:end] for begin, end in windows])
+    assert result == expected
+    report("frozen range queries, n={0}, queries={1}".format(size, queries), baseline, candidate)
+    candidate, result = timed(lambda: [columnar[begin:end] for begin, end in windows])
+    assert result == expected
+    report("columnar range queries, n={0}, queries={1}".format(size, queries), baseline, candidate)
+    candidate, result = timed(lambda: [columnar.search_ids(begin, end) for begin, end in windows])
+    assert [len(ids) for ids in result] == [len(hits) for hits in expected]
+    report("columnar range queries by id, n={0}, queries={1}".format(size, queries), baseline, candidate)
+
+
+def bench_merge(size=10**5, added=100):
+    """
+    merge_overlaps() and iter_merged_overlaps() on the whole tree, and
+    re-merging only the range where a merged tree got new intervals.
+    """
+    ivs = random_intervals(size, span=10**7)
+    tree = IntervalTree(ivs)
+    elapsed, merged = timed(lambda: list(tree.iter_merged_overlaps()))
+    print("merge, n={0}: iter_merged_overlaps() {1:.3f}s".format(size, elapsed))
+    memory, count = peak_memory(lambda: sum(1 for iv in tree.iter_merged_overlaps()))
+    if memory is not None:
+        print("merge, n={0}: iter_merged_overlaps() peak {1:.1f}MB".format(
+            size, memory / 2.0**20
+        ))
+    memory, result = peak_memory(tree.merge_overlaps)
+    if memory is not None:
+        print("merge, n={0}: merge_overlaps() peak {1:.1f}MB".format(
+            size, memory / 2.0**20
+        ))
+    assert sorted(tree) == merged
+
+    batch = random_intervals(added, span=10**4, seed=5)
+    expected = IntervalTree(merged)
+    expected.update(batch)
+    baseline, result = timed(expected.merge_overlaps)
+    tree = IntervalTree(merged)
+    tree.update(batch)
+    candidate, result = timed(tree.merge_overlaps, begin=0, end=10**4 + 200)
+    assert tree == expected
+    report("merge, n={0}: re-merging after adding {1}".format(size, added), baseline, candidate)
+
+
+def bench_copy(size=10**5, edits=10):
+    """
+    copy() followed by a few edits to the copy, against rebuilding the
+    tree from its intervals.
+    """
+    tree = IntervalTree(random_intervals(size))
+    batch = random_intervals(edits, seed=7)
+
+    def edited(copy):
+        result = copy()
+        for iv in batch:
+            result.add(iv)
+        return result
+
+    baseline, expected = timed(edited, lambda: IntervalTree(tree))
+    candidate, result = timed(edited, tree.copy)
+    assert result == expected
+    report("copy, n={0}, then {1} edits".format(size, edits), baseline, candidate)
+    candidate, result = timed(tree.copy)
+    print("copy, n={0}: copy() alone {1:.6f}s".format(size, candidate))
+
+
+BENCHMARKS = [
+    bench_search_many,
+    bench_search_ranges,
+    bench_search_points_array,
+    bench_from_sorted,
+    bench_construction,
+    bench_update,
+    bench_small_edits,
+    bench_remove,
+    bench_fat_nodes,
+    bench_slice_many,
+    bench_find_nested,
+    bench_split_overlaps,
+    bench_set_algebra,
+    bench_frozen,
+    bench_merge,
+    bench_copy,
+]
+
+
+def main(names):
+    for bench in BENCHMARKS:
+        if not names or bench.__name__ in names or bench.__name__[6:] in names:
+            bench()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,161 @@
+"""
+intervaltree: A mutable, self-balancing interval tree for Python 2 and 3.
+Queries may be by point, by range overlap, or by range envelopment.
+
+Test module: FrozenIntervalTree
+
+Copyright 2013-2015 Chaim-Leib Halbert
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import absolute_import
+from intervaltree import Interval, IntervalTree, FrozenIntervalTree
+from random import Random
+import pytest
+from test.intervaltrees import trees
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+def test_empty():
+    t = FrozenIntervalTree()
+    assert len(t) == 0
+    assert t.is_empty()
+    assert t[3] == set()
+    assert t[4:6] == set()
+    assert t[:] == set()
+    assert not t.overlaps(3)
+    assert t.begin() == 0
+    assert t.end() == 0
+    assert t.range().is_null()
+    assert list(t) == []
+    assert t == FrozenIntervalTree(IntervalTree())
+    assert repr(t) == "FrozenIntervalTree()"
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        FrozenIntervalTree([Interval(1, 2), Interval(3, 3)])
+
+
+def test_construct():
+    for name in ['ivs1', 'ivs2', 'ivs3', 'issue25_orig']:
+        t = trees[name]()
+        f = FrozenIntervalTree(t)
+        assert len(f) == len(t)
+        assert list(f) == sorted(t)
+        assert f.items() == t.items()
+        assert f == FrozenIntervalTree(list(t))
+        assert f == FrozenIntervalTree.from_tuples(tuple(iv) for iv in t)
+        assert f.begin() == t.begin()
+        assert f.end() == t.end()
+        assert all(iv in f for iv in t)
+        assert Interval(t.begin(), t.end(), 'missing') not in f
+        assert 1 not in f
+        assert pickle.loads(pickle.dumps(f)) == f
+        assert hash(f) == hash(FrozenIntervalTree(t))
+
+    assert FrozenIntervalTree([Interval(1, 2)] * 2) == FrozenIntervalTree([Interval(1, 2)])
+    assert FrozenIntervalTree([Interval(1, 2)]) != IntervalTree([Interval(1, 2)])
+
+
+def test_queries():
+    for name in ['ivs1', 'ivs2', 'ivs3', 'issue25_orig']:
+        t = trees[name]()
+        f = FrozenIntervalTree(t)
+        lo, hi = int(t.begin()) - 1, int(t.end()) + 2
+        step = max(1, (hi - lo) // 40)
+        for begin in range(lo, hi, step):
+            assert f[begin] == t[begin]
+            assert f.overlaps(begin) == t.overlaps(begin)
+            assert f[begin:] == t[begin:]
+            assert f[:begin] == t[:begin]
+            for end in range(begin - 1, hi + 1, step):
+                assert f[begin:end] == t[begin:end]
+                assert f.search(Interval(begin, end)) == t.search(begin, end)
+                assert f.search(begin, end, strict=True) == \
+                    t.search(begin, end, strict=True)
+                assert f.overlaps(begin, end) == t.overlaps(begin, end)
+        assert f[:] == set(t)
+
+
+def test_columns():
+    f = FrozenIntervalTree.from_columns([], [])
+    assert f == FrozenIntervalTree()
+
+    for name in ['ivs1', 'ivs2', 'issue25_orig']:
+        t = trees[name]()
+        f = FrozenIntervalTree(t)
+        ivs = list(t)
+        g = FrozenIntervalTree.from_columns(
+            [iv.begin for iv in ivs],
+            [iv.end for iv in ivs],
+            [iv.data for iv in ivs]
+        )
+        assert g == f
+        assert list(g) == list(f)
+        for point in range(int(t.begin()) - 1, int(t.end()) + 1):
+            ids = f.search_ids(point)
+            assert ids == sorted(ids)
+            assert set(f.interval_at(i) for i in ids) == t[point]
+            ids = f.search_ids(point, point + 3)
+            assert ids == sorted(ids)
+            assert set(f.interval_at(i) for i in ids) == t[point:point + 3]
+
+    # duplicates are dropped; intervals differing only in data are kept
+    f = FrozenIntervalTree.from_columns([1, 1, 1, 0], [2, 2, 2, 1], ['a', 'b', 'a', None])
+    assert list(f) == [Interval(0, 1), Interval(1, 2, 'a'), Interval(1, 2, 'b')]
+    f = FrozenIntervalTree.from_columns([1] * 5, [2] * 5, [['a'], 'a', ['a'], 'b', 'a'])
+    assert list(f) == [Interval(1, 2, ['a']), Interval(1, 2, 'a'), Interval(1, 2, 'b')]
+    # a long run of equal ranges is deduplicated in linear time
+    size = 10**5
+    f = FrozenIntervalTree.from_columns([0] * size * 2, [1] * size * 2, list(range(size)) * 2)
+    assert len(f) == size
+    assert f.search_ids(0) == list(range(size))
+    f = FrozenIntervalTree.from_columns([3, 1, 3], [4, 2, 4])
+    assert list(f) == [Interval(1, 2), Interval(3, 4)]
+    assert f.data is None
+    assert pickle.loads(pickle.dumps(f)) == f
+
+    # numbers are packed into arrays when possible
+    assert FrozenIntervalTree.from_columns([1, 3], [2, 4]).begins.typecode in 'ql'
+    assert FrozenIntervalTree.from_columns([1.5], [2.5]).ends.typecode == 'd'
+    assert isinstance(FrozenIntervalTree.from_columns([1, 1.5], [2, 2]).begins, list)
+    assert isinstance(FrozenIntervalTree.from_columns([1], [2**70]).ends, list)
+
+    with pytest.raises(ValueError):
+        FrozenIntervalTree.from_columns([1, 2], [3])
+    with pytest.raises(ValueError):
+        FrozenIntervalTree.from_columns([1, 2], [3, 2])
+
+
+def test_random_queries():
+    rand = Random(0)
+    for size in [1, 2, 3, 7, 8, 9, 16, 17, 100, 1000]:
+        ivs = []
+        for i in range(size):
+            begin = rand.randint(0, 1000)
+            ivs.append(Interval(begin, begin + rand.randint(1, 300)))
+        t = IntervalTree(ivs)
+        f = FrozenIntervalTree(ivs)
+        for i in range(200):
+            point = rand.randint(-10, 1310)
+            assert f[point] == t[point]
+            end = point + rand.randint(1, 100)
+            assert f[point:end] == t[point:end]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-v'])
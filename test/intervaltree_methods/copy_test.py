@@ -22,6 +22,7 @@ from __future__ import absolute_import
 from intervaltree import Interval, IntervalTree
 import pytest
 from test.intervaltrees import trees
+from random import Random
 try:
     import cPickle as pickle
 except ImportError:
@@ -65,5 +66,92 @@ def test_copy_cast():
     assert tset == t.items()
 
 
+def test_copy_on_write():
+    rand = Random(3)
+
+    def random_interval():
+        begin = rand.randint(0, 300)
+        if rand.random() < 0.3:
+            return Interval(begin // 10, 400 - begin // 10, rand.randint(0, 3))  # fat nodes
+        return Interval(begin, begin + rand.randint(1, 20))
+
+    t = IntervalTree(random_interval() for i in range(200))
+    trees = [t]
+    expected = [set(t)]
+    for step in range(600):
+        i = rand.randrange(len(trees))
+        t = trees[i]
+        action = rand.random()
+        if action < 0.1:
+            trees.append(t.copy())
+            expected.append(set(expected[i]))
+        elif action < 0.5:
+            iv = random_interval()
+            t.add(iv)
+            expected[i].add(iv)
+        elif action < 0.85:
+            if expected[i]:
+                iv = rand.choice(sorted(expected[i]))
+                t.remove(iv)
+                expected[i].remove(iv)
+        elif action < 0.95:
+            begin = rand.randint(0, 300)
+            t.remove_overlap(begin, begin + 5)
+            expected[i] = set(iv for iv in expected[i] if not iv.overlaps(begin, begin + 5))
+        else:
+            ivs = [random_interval() for j in range(100)]
+            t.update(ivs)
+            expected[i].update(ivs)
+        if step % 50 == 0:
+            for t, ivs in zip(trees, expected):
+                t.verify()
+                assert set(t) == ivs
+    for t, ivs in zip(trees, expected):
+        t.verify()
+        assert set(t) == ivs
+        assert t[150] == set(iv for iv in ivs if iv.contains_point(150))
+
+
+def test_copy_on_write_batch_removal():
+    ivs = [Interval(i, i + 5) for i in range(0, 50, 10)]
+    t = IntervalTree(ivs)
+    t2 = t.copy()
+    t2.bulk_removal_ratio = None  # remove one node at a time
+    t2.remove_overlap(0, 50)
+    assert not t2
+    t.verify()
+    assert set(t) == set(ivs)
+
+
+def test_copy_on_write_rebuilt_subtree():
+    # clearing most of one side rebuilds the subtree; its new nodes
+    # belong to the copy, so later writes do not copy them again
+    ivs = [Interval(i, i + 1) for i in range(64)]
+    t = IntervalTree(ivs)
+    t2 = t.copy()
+    t2.bulk_removal_ratio = None
+    t2.remove_overlap(0, 30)
+    t2.verify()
+    stack = [t2.top_node]
+    while stack:
+        node = stack.pop()
+        assert node.owner is t2._owner
+        stack.extend(child for child in (node[0], node[1]) if child)
+    assert set(t) == set(ivs)
+
+
+def test_copy_search_cache():
+    t = IntervalTree([Interval(0, 10)])
+    t.enable_search_cache()
+    assert t[5] == set([Interval(0, 10)])
+    t2 = t.copy()
+    t2.addi(4, 6)
+    assert t[5] == set([Interval(0, 10)])
+    assert t2[5] == set([Interval(0, 10), Interval(4, 6)])
+    t.removei(0, 10)
+    assert t[5] == set()
+    assert t2[5] == set([Interval(0, 10), Interval(4, 6)])
+
+
 if __name__ == "__main__":
     pytest.main([__file__, '-v'])
@@ -20,6 +20,7 @@ limitations under the License.
 """
 from __future__ import absolute_import
 from intervaltree import Interval, IntervalTree
+from random import Random
 import pytest
 from test.intervaltrees import trees, sdata
 try:
@@ -119,6 +120,70 @@ def test_emptying_iteration():
     assert not t
 
 
+def test_emptying_random_order():
+    """
+    Removing greatest children used to rotate before moving their
+    overlaps up, leaving intervals where remove() couldn't find them.
+    """
+    rand = Random(5)
+    for trial in range(40):
+        ivs = set()
+        for i in range(rand.randint(1, 200)):
+            begin = rand.randint(0, 1000)
+            ivs.add(Interval(begin, begin + rand.randint(1, rand.choice([5, 50, 500]))))
+        t = IntervalTree(ivs)
+        order = list(ivs)
+        rand.shuffle(order)
+        for iv in order:
+            t.remove(iv)
+            t.verify()
+        assert not t
+
+
+def test_bulk_removal():
+    ivs = [Interval(i, i + length, i) for i, length in zip(range(0, 300, 2), [3, 7, 40] * 50)]
+    for ratio in [None, 0, 0.35, 100]:
+        for begin, end in [(0, 1), (10, 50), (100, 250), (-10, 400), (500, 600)]:
+            t = IntervalTree(ivs)
+            t.bulk_removal_ratio = ratio
+            t.enable_search_cache()
+            t[begin:end]
+            t.remove_overlap(begin, end)
+            t.verify()
+            assert t == IntervalTree(iv for iv in ivs if not iv.overlaps(begin, end))
+            assert t[begin:end] == set()
+
+            t = IntervalTree(ivs)
+            t.bulk_removal_ratio = ratio
+            t.remove_envelop(begin, end)
+            t.verify()
+            assert t == IntervalTree(
+                iv for iv in ivs if not (begin <= iv.begin and iv.end <= end)
+            )
+
+
+def test_bulk_removal_random():
+    # trees built one interval at a time have uneven shapes, so removals
+    # take every path through Node.remove_many()
+    rand = Random(7)
+    for size in [10, 100, 1000]:
+        ivs = set()
+        while len(ivs) < size:
+            begin = rand.randint(0, 1000)
+            ivs.add(Interval(begin, begin + rand.choice([1, 5, 50, 400])))
+        t = IntervalTree()
+        for iv in ivs:
+            t.add(iv)
+        t.bulk_removal_ratio = None
+        for _ in range(10):
+            begin = rand.randint(0, 1000)
+            end = begin + rand.randint(1, 100)
+            t.remove_overlap(begin, end)
+            ivs = set(iv for iv in ivs if not iv.overlaps(begin, end))
+            t.verify()
+            assert set(t) == ivs
+
+
 def test_emptying_clear():
     t = trees['ivs1']()
     assert t
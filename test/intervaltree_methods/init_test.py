@@ -81,5 +81,44 @@ def test_invalid_interval_init():
         IntervalTree(Interval(b, e) for b, e in [(1, 2), (1, 1)])
 
 
+def test_sorted_init():
+    ivs = [Interval(-20, -10), Interval(-10, 10), Interval(-10, 10, 'a'), Interval(10, 20)]
+    tree = IntervalTree.from_sorted(ivs)
+    tree.verify()
+    assert tree == IntervalTree(ivs)
+    assert list(tree.iter_sorted()) == ivs
+
+    tree = IntervalTree.from_sorted(iv for iv in ivs + ivs[-1:])
+    tree.verify()
+    assert len(tree) == 4
+
+    tree = IntervalTree.from_sorted(ivs, assume_unique=True)
+    tree.verify()
+    assert tree == IntervalTree(ivs)
+
+    assert IntervalTree.from_sorted([]) == IntervalTree()
+
+    with pytest.raises(ValueError):
+        IntervalTree.from_sorted([Interval(1, 3), Interval(1, 2)])
+
+    with pytest.raises(ValueError):
+        IntervalTree.from_sorted([Interval(1, 2), Interval(3, 3)])
+
+
+def test_sorted_init_shapes():
+    n = 2000
+    for ivs in [
+        [Interval(i, i + 1) for i in range(n)],         # disjoint
+        [Interval(i, i + 3) for i in range(n)],         # chained
+        [Interval(i, 2 * n - i) for i in range(n)],     # nested
+        [Interval(0, i + 1) for i in range(n)],         # same begin
+        [Interval(i, n) for i in range(n)],             # same end
+    ]:
+        tree = IntervalTree.from_sorted(ivs, assume_unique=True)
+        tree.verify()
+        assert tree.top_node.depth <= 12
+        assert tree.search(n // 2) == set(iv for iv in ivs if iv.contains_point(n // 2))
+
+
 if __name__ == "__main__":
     pytest.main([__file__, '-v'])
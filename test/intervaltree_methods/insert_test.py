@@ -158,5 +158,23 @@ def test_insert_to_filled_tree():
     t.verify()
 
 
+def test_fat_node_insert():
+    """
+    Many intervals sharing one node, more than fit in a small center.
+    """
+    t = IntervalTree()
+    ivs = [Interval(-i, i + 1, i) for i in range(20)]
+    for iv in ivs:
+        t.add(iv)
+        t.verify()
+    assert t.top_node.s_center == frozenset(ivs)
+    assert t[0] == set(ivs)
+    for iv in ivs[::2]:
+        t.remove(iv)
+        t.verify()
+    assert t[0] == set(ivs[1::2])
+    assert t == IntervalTree(ivs[1::2])
+
+
 if __name__ == "__main__":
     pytest.main([__file__, '-v'])
@@ -19,8 +19,13 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 from __future__ import absolute_import
+from datetime import datetime, timedelta
 from intervaltree import Interval, IntervalTree
+import intervaltree
+import os
 import pytest
+import subprocess
+import sys
 from test.intervaltrees import trees, sdata
 try:
     import cPickle as pickle
@@ -140,6 +145,263 @@ def test_overlaps():
     assert not t.overlaps(3, 0)
 
 
+def test_range_queries():
+    for name in ['ivs1', 'ivs2', 'ivs3', 'issue25_orig']:
+        t = trees[name]()
+        lo, hi = int(t.begin()) - 1, int(t.end()) + 2
+        step = max(1, (hi - lo) // 40)
+        ranges = []
+        for begin in range(lo, hi, step):
+            for end in range(begin + 1, hi + 1, step):
+                ranges.append((begin, end))
+                assert t.search(begin, end) == set(
+                    iv for iv in t if iv.overlaps(begin, end)
+                )
+                assert t.search(begin, end, strict=True) == set(
+                    iv for iv in t if begin <= iv.begin and iv.end <= end
+                )
+                assert t.overlaps(begin, end) == any(
+                    iv.overlaps(begin, end) for iv in t
+                )
+                assert t.count_overlap(begin, end) == len(t[begin:end])
+            assert t.count_overlap(begin) == len(t[begin])
+        ranges.append((hi, lo))
+        for strict in (False, True):
+            assert t.search_ranges(ranges, strict) == [
+                t.search(begin, end, strict) for begin, end in ranges
+            ]
+    assert IntervalTree().search_ranges([(1, 2)]) == [set()]
+
+
+def test_iter_search():
+    assert list(IntervalTree().iter_search(1)) == []
+
+    t = trees['ivs1']()
+    assert set(t.iter_search(9)) == t[9]
+    assert set(t.iter_search(4, 6)) == t[4:6]
+    assert set(t.iter_search(6, 11, strict=True)) == t.search(6, 11, strict=True)
+    assert set(t.iter_search(Interval(4, 6))) == t[4:6]
+    assert list(t.iter_search(6, 4)) == []
+    assert list(t.iter_search(15)) == []
+
+    assert len(t[9]) == 3
+    assert len(list(t.iter_search(9, limit=2))) == 2
+    assert set(t.iter_search(9, limit=2)) < t[9]
+    assert set(t.iter_search(9, limit=5)) == t[9]
+    assert list(t.iter_search(9, limit=0)) == []
+
+
+def test_nearest():
+    assert IntervalTree().nearest(1) == []
+
+    def distance(iv, begin, end):
+        return max(iv.begin - end, begin - iv.end, 0)
+
+    for name in ['ivs1', 'ivs3', 'issue25_orig']:
+        t = trees[name]()
+        for begin, end in [(-60, -60), (0, 0), (3, 3), (9.5, 9.5), (12, 13),
+                           (2, 4), (500, 500), (900, 1000)]:
+            expected = sorted(distance(iv, begin, end) for iv in t)
+            for k in [1, 3, len(t) + 1]:
+                query = begin if begin == end else Interval(begin, end)
+                result = t.nearest(query, k)
+                assert len(set(result)) == min(k, len(t))
+                assert [distance(iv, begin, end) for iv in result] == expected[:k]
+
+    t = trees['ivs1']()
+    assert t.nearest(0) == [Interval(1, 2, '[1,2)')]
+    assert t.nearest(Interval(2, 3), 2) == [Interval(1, 2, '[1,2)'), Interval(4, 7, '[4,7)')]
+    assert t.nearest(3, 0) == []
+
+    # a fat node, queried from both sides
+    t = IntervalTree(Interval(i, 40 - i) for i in range(20))
+    t.update(Interval(i, i + 1) for i in range(-10, 50, 4))
+    for begin, end in [(-20, -20), (0.5, 0.5), (20, 20), (38.5, 39), (60, 70)]:
+        expected = sorted(distance(iv, begin, end) for iv in t)
+        result = t.nearest(Interval(begin, end) if begin < end else begin, 10)
+        assert [distance(iv, begin, end) for iv in result] == expected[:10]
+
+    # distances between datetimes are timedeltas
+    day = datetime(2015, 1, 1)
+    t = IntervalTree.from_tuples([
+        (day, day + timedelta(hours=2)),
+        (day + timedelta(hours=5), day + timedelta(hours=6)),
+    ])
+    assert t.nearest(day + timedelta(hours=4)) == [
+        Interval(day + timedelta(hours=5), day + timedelta(hours=6))
+    ]
+    assert len(t.nearest(Interval(day - timedelta(hours=1), day), 2)) == 2
+
+
+def test_count_overlap():
+    assert IntervalTree().count_overlap(1) == 0
+    assert IntervalTree().count_overlap(1, 2) == 0
+
+    t = trees['ivs1']()
+    assert t.count_overlap(9) == 3
+    assert t.count_overlap(Interval(4, 6)) == 2
+    assert t.count_overlap(6, 4) == 0
+
+
+def test_iter_sorted():
+    t = IntervalTree()
+    assert list(t.iter_sorted()) == []
+    assert list(t.irange()) == []
+
+    t = trees['ivs1']()
+    assert list(t.iter_sorted()) == sorted(t)
+    assert list(t.irange()) == sorted(t)
+    assert list(t.irange(5, 8)) == sorted(iv for iv in t if 5 <= iv.begin < 8)
+    assert list(t.irange(6)) == sorted(iv for iv in t if iv.begin >= 6)
+    assert list(t.irange(end=6)) == sorted(iv for iv in t if iv.begin < 6)
+    assert list(t.irange(9, 9)) == []
+
+    t.addi(0, 1)
+    t.addi(5, 6)
+    t.removei(8, 10, '[8,10)')
+    t.discardi(12, 14, '[12,14)')
+    assert list(t.iter_sorted()) == sorted(t)
+
+
+def test_search_cache():
+    t = trees['ivs1']()
+    assert t.search_cache_info() == (0, 0, 0, 0)
+    t[9]
+    assert t.search_cache_info() == (0, 0, 0, 0)
+
+    t.enable_search_cache(maxsize=2)
+    expected = t[9]
+    assert t[9] == expected
+    assert t.search(9) == expected
+    assert t.search_cache_info() == (2, 1, 2, 1)
+
+    # results are copies
+    t[9].clear()
+    assert t[9] == expected
+
+    # least recently used result is evicted
+    t[4:6]
+    t[9]
+    t.search(6, 11, strict=True)
+    assert t.search_cache_info() == (5, 3, 2, 2)
+    t[4:6]
+    assert t.search_cache_info() == (5, 4, 2, 2)
+
+    # mutations invalidate the cache
+    t.addi(9, 10)
+    assert t.search_cache_info().currsize == 0
+    assert t[9] == expected | set([Interval(9, 10)])
+    t.removei(9, 10)
+    assert t[9] == expected
+    t.remove_overlap(9)
+    assert t[9] == set()
+    t.clear()
+    assert t.search_cache_info().maxsize == 2
+    assert t[4:6] == set()
+
+    t.disable_search_cache()
+    assert t.search_cache_info() == (0, 0, 0, 0)
+
+
+def test_search_many():
+    assert IntervalTree().search_many([1, 2]) == [set(), set()]
+
+    t = trees['ivs1']()
+    assert t.search_many([]) == []
+    points = [9, 4, 15, 4, 0.5, 1, 8, 9.5, -3]
+    assert t.search_many(points) == [t[p] for p in points]
+
+
+def test_search_arrays():
+    np = pytest.importorskip('numpy')
+
+    def unpack(t, offsets, indices):
+        ivs = list(t.iter_sorted())
+        return [
+            set(ivs[i] for i in indices[offsets[j]:offsets[j + 1]])
+            for j in range(len(offsets) - 1)
+        ]
+
+    t = IntervalTree()
+    offsets, indices = t.search_points_array(np.array([1, 2]))
+    assert list(offsets) == [0, 0, 0]
+    assert len(indices) == 0
+
+    for name in ['ivs1', 'ivs3', 'issue25_orig']:
+        t = trees[name]()
+        points = np.arange(t.begin() - 1, t.end() + 1, 0.5)
+        assert unpack(t, *t.search_points_array(points)) == t.search_many(points)
+
+        begins = np.repeat(points, 5)
+        ends = begins + np.tile([-1, 0, 0.5, 3, 20], len(points))
+        ranges = list(zip(begins, ends))
+        for strict in (False, True):
+            assert unpack(t, *t.search_ranges_array(begins, ends, strict)) == \
+                t.search_ranges(ranges, strict)
+
+    # arrays are rebuilt when the tree changes
+    t.addi(100, 200)
+    assert unpack(t, *t.search_points_array([150])) == [set([Interval(100, 200)])]
+
+
+def test_numpy_imported_lazily():
+    code = "import sys, intervaltree; sys.exit('numpy' in sys.modules)"
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(intervaltree.__file__)))
+    assert subprocess.call([sys.executable, '-c', code], cwd=cwd) == 0
+
+
+def test_fat_node_queries():
+    # long sessions all sharing one node, with some short intervals
+    t = IntervalTree(Interval(i, 1000 - 3 * i, i) for i in range(100))
+    t.update(Interval(i, i + 2) for i in range(0, 1000, 7))
+    t.verify()
+    for point in range(-2, 1002, 3):
+        expected = set(iv for iv in t if iv.contains_point(point))
+        assert t[point] == expected
+        assert set(t.iter_search(point)) == expected
+        assert t.count_overlap(point) == len(expected)
+        assert t.search_many([point]) == [expected]
+        assert t.overlaps(point) == bool(expected)
+        end = point + 5
+        expected = set(iv for iv in t if iv.overlaps(point, end))
+        assert t[point:end] == expected
+        assert set(t.iter_search(point, end)) == expected
+        assert t.count_overlap(point, end) == len(expected)
+        assert t.search_ranges([(point, end)]) == [expected]
+        assert t.overlaps(point, end) == bool(expected)
+    points = [p + 0.5 * (p % 2) for p in range(-2, 1002, 3)]
+    assert t.search_many(points) == [t[p] for p in points]
+
+    for i in range(0, 100, 3):
+        t.removei(i, 1000 - 3 * i, i)
+    t.verify()
+    assert t[600] == set(iv for iv in t if iv.contains_point(600))
+
+
+def test_find_nested():
+    def brute_force(t):
+        result = {}
+        for parent in t:
+            for child in t:
+                if parent != child and parent.contains_interval(child):
+                    result.setdefault(parent, set()).add(child)
+        return result
+
+    for name in ['ivs1', 'ivs2', 'ivs3', 'issue25_orig']:
+        t = trees[name]()
+        assert t.find_nested() == brute_force(t)
+    t = IntervalTree(Interval(i, 100 - i) for i in range(50))
+    t.addi(10, 11)
+    t.addi(10, 90)
+    assert t.find_nested() == brute_force(t)
+
+    # of two intervals with the same range, one is the parent
+    t = IntervalTree([Interval(0, 10, 'a'), Interval(0, 10, 'b'), Interval(2, 3)])
+    nested = t.find_nested()
+    assert sorted(len(children) for children in nested.values()) == [1, 2]
+    assert Interval(2, 3) not in nested
+
+
 def test_span():
     e = IntervalTree()
     assert e.span() == 0
@@ -22,6 +22,8 @@ from __future__ import absolute_import
 from intervaltree import Interval, IntervalTree
 import pytest
 from test.intervaltrees import trees
+from test import intervals
+from random import Random
 try:
     import cPickle as pickle
 except ImportError:
@@ -278,6 +280,79 @@ def test_merge_equals_reducer_with_initializer():
     assert t.containsi(4, 7, ['[4,7)', 'foo'])
 
 
+def test_iter_merged():
+    def concat(a, b):
+        return a + b
+
+    t = IntervalTree()
+    for data in 'cab':
+        t.addi(0, 10, data)
+    t.addi(5, 12, 'd')
+    t.addi(12, 15, 'e')
+    t.addi(20, 30, 'f')
+    assert list(t.iter_merged_overlaps(data_reducer=concat)) == [
+        Interval(0, 15, 'abcde'), Interval(20, 30, 'f'),
+    ]
+    assert list(t.iter_merged_equals(data_reducer=concat, data_initializer='')) == [
+        Interval(0, 10, 'abc'), Interval(5, 12, 'd'),
+        Interval(12, 15, 'e'), Interval(20, 30, 'f'),
+    ]
+    # ranges select whole groups; the tree is unchanged
+    assert list(t.iter_merged_overlaps(13, 14, concat)) == [Interval(0, 15, 'abcde')]
+    assert list(t.iter_merged_overlaps(15, 20)) == []
+    assert list(t.iter_merged_overlaps(end=20)) == [Interval(0, 15)]
+    assert list(t.iter_merged_equals(11, 13, concat)) == [
+        Interval(5, 12, 'd'), Interval(12, 15, 'e'),
+    ]
+    assert len(t) == 6
+
+    # a group ending exactly at begin is left alone, and internal
+    # searches do not touch the search cache
+    t = IntervalTree.from_tuples([(0, 5), (3, 10), (20, 30)])
+    t.enable_search_cache()
+    assert list(t.iter_merged_overlaps(10, 15)) == []
+    t.merge_overlaps(begin=10, end=15)
+    t.merge_equals(begin=10, end=15)
+    assert sorted(t) == [Interval(0, 5), Interval(3, 10), Interval(20, 30)]
+    t.merge_overlaps(begin=9, end=15)
+    assert sorted(t) == [Interval(0, 10), Interval(20, 30)]
+    assert t.search_cache_info()[:2] == (0, 0)
+
+    rand = Random(2)
+    for i in range(30):
+        ivs = []
+        for j in range(40):
+            begin = rand.randint(0, 200)
+            ivs.append(Interval(begin, begin + rand.randint(1, 15), str(j)))
+        t = IntervalTree(ivs)
+        expected = IntervalTree(ivs)
+        expected.merge_overlaps(concat)
+        merged = list(t.iter_merged_overlaps(data_reducer=concat))
+        assert merged == sorted(expected)
+        expected = IntervalTree(ivs)
+        expected.merge_equals(concat, '')
+        assert list(t.iter_merged_equals(data_reducer=concat, data_initializer='')) == \
+            sorted(expected)
+        assert t == IntervalTree(ivs)
+
+        begin = rand.randint(0, 200)
+        end = begin + rand.randint(1, 30)
+        window = [iv for iv in merged if iv.overlaps(begin, end)]
+        assert list(t.iter_merged_overlaps(begin, end, concat)) == window
+
+        t.merge_overlaps(concat, begin=begin, end=end)
+        t.verify()
+        assert sorted(t[begin:end]) == window
+        assert list(t.iter_merged_overlaps(data_reducer=concat)) == merged
+
+        t = IntervalTree(ivs)
+        t.merge_equals(concat, begin=begin, end=end)
+        t.verify()
+        assert sorted(t[begin:end]) == list(IntervalTree(ivs).iter_merged_equals(
+            begin, end, concat))
+        assert set(t) - t[begin:end] == set(ivs) - IntervalTree(ivs)[begin:end]
+
+
 def test_chop():
     t = IntervalTree([Interval(0, 10)])
     t.chop(3, 7)
@@ -378,6 +453,70 @@ def test_slice_datafunc():
     assert sorted(t)[0] == Interval(5, 15)
 
 
+def test_chop_many():
+    t = IntervalTree([Interval(0, 10), Interval(5, 30, 'a')])
+    t.chop_many([(25, 35), (3, 7), (6, 8), (8, 9), (12, 12)])
+    assert sorted(t) == [
+        Interval(0, 3), Interval(9, 10),
+        Interval(9, 25, 'a'),
+    ]
+
+    def datafunc(iv, islower):
+        return islower
+    t = IntervalTree([Interval(0, 10)])
+    t.chop_many([(2, 3), (5, 7)], datafunc)
+    assert sorted(t) == [
+        Interval(0, 2, True), Interval(3, 5, False), Interval(7, 10, False),
+    ]
+    t.chop_many([])
+    assert len(t) == 3
+
+    rand = Random(0)
+    for i in range(20):
+        ivs = []
+        for j in range(50):
+            begin = rand.randint(0, 100)
+            ivs.append(Interval(begin, begin + rand.randint(1, 30), j % 3))
+        ranges = []
+        for j in range(5):
+            begin = rand.randint(0, 120)
+            ranges.append((begin, begin + rand.randint(0, 20)))
+        expected = IntervalTree(ivs)
+        for begin, end in ranges:
+            expected.chop(begin, end)
+        t = IntervalTree(ivs)
+        t.chop_many(ranges)
+        t.verify()
+        assert t == expected
+
+
+def test_slice_many():
+    def datafunc(iv, islower):
+        return islower
+    t = IntervalTree([Interval(0, 10), Interval(4, 6)])
+    t.slice_many([8, 2, 5, 5, 10, -1], datafunc)
+    assert sorted(t) == [
+        Interval(0, 2, True), Interval(2, 5, False),
+        Interval(4, 5, True), Interval(5, 6, False),
+        Interval(5, 8, False), Interval(8, 10, False),
+    ]
+
+    rand = Random(1)
+    for i in range(20):
+        ivs = []
+        for j in range(50):
+            begin = rand.randint(0, 100)
+            ivs.append(Interval(begin, begin + rand.randint(1, 30), j % 3))
+        points = [rand.randint(0, 130) for j in range(10)]
+        expected = IntervalTree(ivs)
+        for point in points:
+            expected.slice(point)
+        t = IntervalTree(ivs)
+        t.slice_many(points)
+        t.verify()
+        assert t == expected
+
+
 def test_split_overlap_empty():
     t = IntervalTree()
     t.split_overlaps()
@@ -406,6 +545,21 @@ def test_split_overlap():
             assert other.end == iv.end
 
 
+def test_split_overlap_pieces():
+    for labels in (False, True):
+        t = IntervalTree(intervals.overlaps_nogaps_rand(100, labels))
+        t.addi(0, 1000, 'long')
+        bounds = sorted(t.boundary_table)
+        expected = set()
+        for lbound, ubound in zip(bounds[:-1], bounds[1:]):
+            for iv in t[lbound]:
+                expected.add(Interval(lbound, ubound, iv.data))
+
+        t.split_overlaps()
+        t.verify()
+        assert set(t) == expected
+
+
 def test_pickle():
     t = trees['ivs1']()
 
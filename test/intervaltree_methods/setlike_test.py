@@ -58,6 +58,47 @@ def test_update():
     assert sorted(t)[1] == interval
 
 
+def test_bulk_update():
+    base = [Interval(i, i + 5, i) for i in range(0, 100, 3)]
+    for ratio in [None, 0, 0.5, 100]:
+        for batch in [[], base[:3], [Interval(i, i + 2) for i in range(50)], base]:
+            t = IntervalTree(base)
+            t.bulk_update_ratio = ratio
+            t.enable_search_cache()
+            t[40]  # cached results must not survive the update
+            t.update(iv for iv in batch + batch)
+            t.verify()
+            assert t == IntervalTree(base + batch)
+            assert t[40] == set(iv for iv in base + batch if iv.contains_point(40))
+
+    t = IntervalTree(base)
+    t.bulk_update_ratio = 0
+    with pytest.raises(ValueError):
+        t.update([Interval(1, 2), Interval(3, 3)])
+    assert t == IntervalTree(base)
+
+
+def test_small_update_cost():
+    class CountingSet(set):
+        lookups = 0
+
+        def __contains__(self, item):
+            CountingSet.lookups += 1
+            return set.__contains__(self, item)
+
+    t = IntervalTree(Interval(i, i + 2) for i in range(1000))
+    t.all_intervals = CountingSet(t.all_intervals)
+    batch = [Interval(5, 6), Interval(0, 2), Interval(7, 8)]
+    t.update(batch)
+    # the batch is filtered by looking up each of its intervals, and
+    # add() looks up the two new ones again. Set operations between
+    # the batch and the tree's set would walk the whole tree on older
+    # Pythons instead.
+    assert CountingSet.lookups == len(batch) + 2
+    t.verify()
+    assert len(t) == 1002
+
+
 def test_invalid_update():
     t = IntervalTree()
 
@@ -119,6 +160,46 @@ def test_union_operator():
     assert sorted(t)[0] == interval
 
 
+def test_set_algebra():
+    a = [Interval(i, i + 5, i % 4) for i in range(0, 60, 2)]
+    b = [Interval(i, i + 5, i % 4) for i in range(0, 60, 3)] + [Interval(0, 5, 'b')]
+    ops = [
+        ('union', 'update', set.union),
+        ('difference', 'difference_update', set.difference),
+        ('intersection', 'intersection_update', set.intersection),
+        ('symmetric_difference', 'symmetric_difference_update', set.symmetric_difference),
+    ]
+    for left, right in [(a, b), (b, a), (a, []), ([], b), (a, a)]:
+        expected_ivs = {}
+        for name, update_name, set_op in ops:
+            expected = set_op(set(left), set(right))
+            for other in [IntervalTree(right), set(right), list(right), iter(right)]:
+                t = IntervalTree(left)
+                r = getattr(t, name)(other)
+                r.verify()
+                assert set(r) == expected
+                assert t == IntervalTree(left)
+
+            for other in [IntervalTree(right), list(right), iter(right)]:
+                t = IntervalTree(left)
+                getattr(t, update_name)(other)
+                t.verify()
+                assert set(t) == expected
+
+    t = IntervalTree(a)
+    assert set(t | IntervalTree(b)) == set(a) | set(b)
+    assert set(t & IntervalTree(b)) == set(a) & set(b)
+    assert set(t - IntervalTree(b)) == set(a) - set(b)
+    assert set(t ^ IntervalTree(b)) == set(a) ^ set(b)
+    t ^= IntervalTree(b)
+    t.verify()
+    assert set(t) == set(a) ^ set(b)
+    t &= IntervalTree(a)
+    assert set(t) == set(a) - set(b)
+    t -= t
+    assert not t
+
+
 def test_invalid_union():
     t = IntervalTree()
 